@@ -1,3 +1,15 @@
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Number of masses per chunk of the NumPy mode.
+CHUNK_SIZE = 1 << 20
+
+
 def fuel_for_mass(mass):
     """
     Mass of fuel for given mass.
@@ -29,11 +41,70 @@ def corrected_fuel_for_mass(mass):
     return result
 
 
+def mass_chunks(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yields the masses of the stream as int64 arrays of about chunk_size
+    masses. Files are read in blocks of chunk_size * 8 characters that
+    are parsed by NumPy, other streams chunk_size items at a time.
+    """
+    if hasattr(stream, 'read'):
+        tail = None
+        while True:
+            block = stream.read(chunk_size * 8)
+            if not block:
+                break
+            if tail:
+                block = tail + block
+            cut = block.rfind(b'\n' if isinstance(block, bytes) else '\n') + 1
+            text, tail = block[:cut], block[cut:]
+            if text.strip():
+                yield np.fromstring(text, dtype=np.int64, sep=' ')
+        if tail and tail.strip():
+            yield np.fromstring(tail, dtype=np.int64, sep=' ')
+        return
+
+    stream = iter(stream)
+    while True:
+        chunk = np.fromiter(map(int, islice(stream, chunk_size)), dtype=np.int64)
+        if not chunk.size:
+            break
+        yield chunk
+
+
+def corrected_fuel_for_masses(masses):
+    """
+    Total mass of fuel corrected for fuels own mass for an array of
+    masses. Every round only computes the fuel that is still positive.
+    """
+    result = 0
+    fuel = masses
+    while fuel.size:
+        fuel = fuel_for_mass(fuel)
+        fuel = fuel[fuel > 0]
+        result += int(fuel.sum())
+    return result
+
+
+def sum_fuel(stream, corrected=False, chunk_size=CHUNK_SIZE):
+    """
+    Sum of the fuel, corrected or not, for the masses of the stream
+    computed in chunks with NumPy, so the stream is read in bounded
+    memory. Falls back to sum_func without NumPy.
+    """
+    if np is None:
+        return sum_func(corrected_fuel_for_mass if corrected else fuel_for_mass, stream)
+
+    chunks = mass_chunks(stream, chunk_size)
+    if corrected:
+        return sum(corrected_fuel_for_masses(chunk) for chunk in chunks)
+    return sum(int(fuel_for_mass(chunk).sum()) for chunk in chunks)
+
+
 if __name__ == '__main__':
     with open('inputs/input_day01.in') as file:
-        part_1_result = sum_func(fuel_for_mass, file)
+        part_1_result = sum_fuel(file)
         print("Part 1: ", part_1_result)
 
     with open('inputs/input_day01.in') as file:
-        part_2_result = sum_func(corrected_fuel_for_mass, file)
+        part_2_result = sum_fuel(file, corrected=True)
         print("Part 2: ", part_2_result)
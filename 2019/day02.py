@@ -1,5 +1,6 @@
 from intcode_computer.program import Program
 from intcode_computer.computer import Computer
+from intcode_computer.symbolic import solve
 
 
 if __name__ == '__main__':
@@ -14,10 +15,6 @@ if __name__ == '__main__':
     print("Part1: ", Computer(program).run())
 
     # Part 2: Search for noun and verb that computes to 19690720
-    for noun in range(100):
-        for verb in range(100):
-            program = Program(source_code)
-            program.restore(noun, verb)
-            if Computer(program).run() == 19690720:
-                print("Part2: ", 100 * noun + verb)
-                break
+    program = Program(source_code)
+    noun, verb = solve(program, 19690720)
+    print("Part2: ", 100 * noun + verb)
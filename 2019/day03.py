@@ -1,3 +1,81 @@
+import os
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from itertools import combinations
+from multiprocessing import Pool
+
+
+DIRECTIONS = {
+    'U': (0, 1),
+    'D': (0, -1),
+    'L': (-1, 0),
+    'R': (1, 0),
+}
+
+
+BLOCK_SIZE = 1 << 16
+
+
+def _text(block):
+    return block if isinstance(block, str) else bytes(block).decode('ascii')
+
+
+def _blocks(source, block_size):
+    """
+    Yields the source in blocks of text, reading file objects and
+    slicing strings, bytes and buffers.
+    """
+    if hasattr(source, 'read'):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield _text(block)
+    else:
+        if not isinstance(source, str):
+            source = memoryview(source)
+        for start in range(0, len(source), block_size):
+            yield _text(source[start:start + block_size])
+
+
+def _instructions(text):
+    for instruction in text.split(','):
+        instruction = instruction.strip()
+        if not instruction:
+            continue
+        direction = DIRECTIONS.get(instruction[0])
+        if direction is None:
+            raise ValueError("Unrecognised direction code")
+        yield direction, int(instruction[1:])
+
+
+def parse_moves(source, block_size=BLOCK_SIZE):
+    """
+    Yields the instructions of the wire paths in source, one path per
+    line, as pairs of direction and number of moves, and (None, 0)
+    after every path.
+
+    The source is a string, bytes, a buffer such as a memory-mapped
+    file or a file object, which is read in blocks of block_size, so
+    only one block and a partial instruction are held at a time.
+    """
+    tail = ''
+    for block in _blocks(source, block_size):
+        lines = (tail + block).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield from _instructions(line)
+            yield None, 0
+        end = tail.rfind(',')
+        if end >= 0:
+            yield from _instructions(tail[:end])
+            tail = tail[end + 1:]
+    if tail.strip():
+        yield from _instructions(tail)
+        yield None, 0
+
+
 def manhatten(point_1, point_2 = (0,0)):
     """
     Returns the manhatten distance between two points
@@ -6,100 +84,377 @@ def manhatten(point_1, point_2 = (0,0)):
     return abs(point_1[0] - point_2[0]) + abs(point_1[1] - point_2[1])
 
 
+def _clamp(point, lo, hi):
+    """
+    Returns the point of the box from lo to hi that is closest to point.
+    """
+    return (min(max(point[0], lo[0]), hi[0]), min(max(point[1], lo[1]), hi[1]))
+
+
+class Segment:
+    """
+    A straight part of a wire from start to end. The segment occupies
+    the grid points after its start up to and including its end, which
+    lie in the box from lo to hi.
+    """
+    __slots__ = ('start', 'end', 'steps', 'lo', 'hi')
+
+    def __init__(self, start, end, steps):
+        self.start = start
+        self.end = end
+        self.steps = steps
+
+        length = manhatten(start, end)
+        first = (start[0] + (end[0] - start[0]) // length,
+                 start[1] + (end[1] - start[1]) // length)
+        self.lo = (min(first[0], end[0]), min(first[1], end[1]))
+        self.hi = (max(first[0], end[0]), max(first[1], end[1]))
+
+    @property
+    def horizontal(self):
+        return self.start[1] == self.end[1]
+
+    def __contains__(self, point):
+        return (self.lo[0] <= point[0] <= self.hi[0]
+                and self.lo[1] <= point[1] <= self.hi[1])
+
+    def steps_to(self, point):
+        """
+        Returns the steps along the wire to a point of the segment.
+        """
+        return self.steps + manhatten(point, self.start)
+
+
+def _perpendicular_crossings(horizontals, verticals):
+    """
+    Yields the pairs of horizontal and vertical segments that cross,
+    sweeping a vertical line over the horizontal segments in order of x.
+    """
+    events = []
+    for index, segment in enumerate(horizontals):
+        events.append((segment.lo[0], 0, index))
+        events.append((segment.hi[0], 2, index))
+    for index, segment in enumerate(verticals):
+        events.append((segment.lo[0], 1, index))
+    events.sort()
+
+    # Active horizontal segments as sorted (y, index) pairs.
+    active = []
+    for _, kind, index in events:
+        if kind == 0:
+            insort(active, (horizontals[index].lo[1], index))
+        elif kind == 2:
+            del active[bisect_left(active, (horizontals[index].lo[1], index))]
+        else:
+            vertical = verticals[index]
+            start = bisect_left(active, (vertical.lo[1], -1))
+            stop = bisect_right(active, (vertical.hi[1], len(horizontals)))
+            for _, other in active[start:stop]:
+                yield horizontals[other], vertical
+
+
+def _collinear_crossings(segments_1, segments_2, axis):
+    """
+    Yields the pairs of segments of the two lists that lie on the same
+    line and overlap. Axis 0 pairs horizontal segments, axis 1 vertical
+    ones.
+    """
+    lines = {}
+    for side, segments in enumerate((segments_1, segments_2)):
+        for segment in segments:
+            lines.setdefault(segment.lo[1 - axis], ([], []))[side].append(segment)
+
+    for line_1, line_2 in lines.values():
+        if not line_1 or not line_2:
+            continue
+        items = sorted([(segment.lo[axis], 0, i) for i, segment in enumerate(line_1)]
+                       + [(segment.lo[axis], 1, i) for i, segment in enumerate(line_2)])
+        active = ([], [])
+        for lo, side, i in items:
+            segment = (line_1, line_2)[side][i]
+            other = active[1 - side]
+            other[:] = [o for o in other if o.hi[axis] >= lo]
+            for o in other:
+                yield (segment, o) if side == 0 else (o, segment)
+            active[side].append(segment)
+
+
+def segment_index(wire):
+    """
+    Returns the horizontal and the vertical segments of a wire.
+    """
+    segments = wire.segments
+    return ([segment for segment in segments if segment.horizontal],
+            [segment for segment in segments if not segment.horizontal])
+
+
+def crossings(wire_1, wire_2):
+    """
+    Yields the crossings of two wires, or of their segment indexes, as
+    (segment_1, segment_2, lo, hi) where the grid points from lo to hi
+    are shared by segment_1 of wire_1 and segment_2 of wire_2.
+    """
+    if isinstance(wire_1, Wire):
+        wire_1 = segment_index(wire_1)
+    if isinstance(wire_2, Wire):
+        wire_2 = segment_index(wire_2)
+    horizontals_1, verticals_1 = wire_1
+    horizontals_2, verticals_2 = wire_2
+
+    pairs = []
+    pairs.extend(_perpendicular_crossings(horizontals_1, verticals_2))
+    pairs.extend((a, b) for b, a in _perpendicular_crossings(horizontals_2, verticals_1))
+    pairs.extend(_collinear_crossings(horizontals_1, horizontals_2, 0))
+    pairs.extend(_collinear_crossings(verticals_1, verticals_2, 1))
+
+    for segment_1, segment_2 in pairs:
+        lo = (max(segment_1.lo[0], segment_2.lo[0]), max(segment_1.lo[1], segment_2.lo[1]))
+        hi = (min(segment_1.hi[0], segment_2.hi[0]), min(segment_1.hi[1], segment_2.hi[1]))
+        if lo[0] <= hi[0] and lo[1] <= hi[1]:
+            yield segment_1, segment_2, lo, hi
+
+
+# Summary of the crossings of a pair of wires, distance and steps are
+# None for wires that do not cross.
+PairCrossings = namedtuple('PairCrossings', 'distance steps count')
+
+_Box = namedtuple('_Box', 'lo hi')
+
+
+def _merge(intervals):
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def _count_points(found):
+    """
+    Returns the number of distinct grid points of the crossings.
+    """
+    lines = ({}, {})
+    points = set()
+    for _, _, lo, hi in found:
+        if lo == hi:
+            points.add(lo)
+        else:
+            axis = 0 if lo[1] == hi[1] else 1
+            lines[axis].setdefault(lo[1 - axis], []).append((lo[axis], hi[axis]))
+
+    boxes = ([], [])
+    for axis in (0, 1):
+        for line, intervals in lines[axis].items():
+            merged = lines[axis][line] = _merge(intervals)
+            for lo, hi in merged:
+                if axis == 0:
+                    boxes[0].append(_Box((lo, line), (hi, line)))
+                else:
+                    boxes[1].append(_Box((line, lo), (line, hi)))
+
+    def covered(point):
+        for axis in (0, 1):
+            merged = lines[axis].get(point[1 - axis], ())
+            index = bisect_right(merged, [point[axis], float('inf')]) - 1
+            if index >= 0 and merged[index][1] >= point[axis]:
+                return True
+        return False
+
+    count = sum(box.hi[0] - box.lo[0] + box.hi[1] - box.lo[1] + 1 for box in boxes[0] + boxes[1])
+    count -= sum(1 for _ in _perpendicular_crossings(boxes[0], boxes[1]))
+    return count + sum(1 for point in points if not covered(point))
+
+
+def pair_crossings(wire_1, wire_2):
+    """
+    Returns the PairCrossings of two wires, or of their segment indexes:
+    the manhatten distance of
+    the crossing closest to the central port, the minimum combined steps
+    to a crossing and the number of crossing points.
+
+    The steps along both segments of a crossing are convex along the
+    shared points, so the minimum lies at an end of them or next to the
+    start of one of the segments.
+    """
+    found = list(crossings(wire_1, wire_2))
+    if not found:
+        return PairCrossings(None, None, 0)
+
+    distance = min(manhatten(_clamp((0, 0), lo, hi)) for _, _, lo, hi in found)
+    steps = min(segment_1.steps_to(point) + segment_2.steps_to(point)
+                for segment_1, segment_2, lo, hi in found
+                for point in (lo, hi, _clamp(segment_1.start, lo, hi),
+                              _clamp(segment_2.start, lo, hi)))
+    return PairCrossings(distance, steps, _count_points(found))
+
+
+# Segment indexes of the wires of a panel owned by a pair worker process.
+_worker_indexes = None
+
+
+def _init_worker(indexes):
+    global _worker_indexes
+    _worker_indexes = indexes
+
+
+def _pair_crossings(pair):
+    return pair, pair_crossings(_worker_indexes[pair[0]], _worker_indexes[pair[1]])
+
+
 class Panel:
     """
-    A panel
+    A panel of any number of wires.
+
+    Queries cover every pair of wires, or the pairs among a subset of
+    the wires given by their indexes. The segment index of every wire is
+    built once, and with more than one process the pairs are analysed in
+    a process pool whose workers receive the indexes once.
     """
-    def __init__(self, wire_1, wire_2):
-        self._wires = [wire_1, wire_2]
+    def __init__(self, *wires, processes=1):
+        self._wires = list(wires)
+        self._processes = processes
+        self._indexes = None
 
-    def _find_crossings(self):
+    def _segment_indexes(self):
+        if self._indexes is None:
+            self._indexes = [segment_index(wire) for wire in self._wires]
+        return self._indexes
+
+    def pairs(self, wires=None):
         """
-        Returns the set intersection of the wire positions on the grid.
+        Returns the index pairs of the given wire indexes, or of all
+        wires.
         """
-        crossings = []
-        wire_set = set(self._wires[0])
-        for point in self._wires[1]:
-            if point in wire_set:
-                crossings.append(point)
+        if wires is None:
+            wires = range(len(self._wires))
+        return list(combinations(sorted(wires), 2))
 
-        return crossings
+    def pair_crossings(self, wires=None, chunksize=16):
+        """
+        Returns a dict of the PairCrossings by index pair, see pairs.
+        """
+        pairs = self.pairs(wires)
+        indexes = self._segment_indexes()
+        processes = self._processes or os.cpu_count() or 1
+        if processes == 1 or len(pairs) < 2:
+            return {pair: pair_crossings(indexes[pair[0]], indexes[pair[1]]) for pair in pairs}
+
+        with Pool(processes, _init_worker, (indexes,)) as pool:
+            return dict(pool.imap_unordered(_pair_crossings, pairs, chunksize))
 
-    def distance(self):
+    def distance(self, wires=None):
         """
         Returns the manhatten distance to the intersection point
         that is closest to the central port.
         """
-        return min(map(manhatten, self._find_crossings()))
+        return min(crossing.distance for crossing in self.pair_crossings(wires).values()
+                   if crossing.count)
 
-    def minimum_steps_to_crossing(self):
+    def minimum_steps_to_crossing(self, wires=None):
         """
         Return the minimum number of steps to get to an intersection.
         """
-        wire_1 = self._wires[0]
-        wire_2 = self._wires[1]
-
-        crossings = self._find_crossings()
-        distances = []
-        for crossing in crossings:
-            a = wire_1.steps_to(crossing)
-            b = wire_2.steps_to(crossing)
-            distances.append(a + b)
+        return min(crossing.steps for crossing in self.pair_crossings(wires).values()
+                   if crossing.count)
 
-        return min(distances)
+    def crossing_counts(self, wires=None):
+        """
+        Returns a dict of the number of crossing points by index pair.
+        """
+        return {pair: crossing.count for pair, crossing in self.pair_crossings(wires).items()}
 
 
 class Wire:
     """
-    Representation of a wire as a collection of points that it occupies
-    on the panel grid.
-    """
-    def __init__(self, wire):
-        self._x = 0
-        self._y = 0
-        self._points = []
-
-        instructions = wire.split(',')
-        for instruction in instructions:
-            direction = instruction[0]
-            moves = int(instruction[1:])
-
-            if direction == 'U':
-                self._add_points(moves, lambda: self._increment_y(1))
-            elif direction == 'D':
-                self._add_points(moves, lambda: self._increment_y(-1))
-            elif direction == 'L':
-                self._add_points(moves, lambda: self._increment_x(-1))
-            elif direction == 'R':
-                self._add_points(moves, lambda: self._increment_x(1))
-            else:
-                raise ValueError("Unrecognised direction code")
-
-    def _add_points(self, moves, increment):
-        for i in range(1, moves + 1):
-            increment()
-            self._points.append((self._x, self._y))
-
-    def _increment_x(self, value):
-        self._x += value
-
-    def _increment_y(self, value):
-        self._y += value
+    Representation of a wire as the turns of its path on the panel
+    grid, stored as columns of 64 bit integers, with an index of the
+    segments on every grid line of the path.
+    """
+    def __init__(self, wire=''):
+        self._x = array('q', [0])
+        self._y = array('q', [0])
+        self._steps = array('q', [0])
+        self._lines = {}
+
+        for direction, moves in parse_moves(wire):
+            if direction is None:
+                break
+            self.move(direction, moves)
+
+    def move(self, direction, moves):
+        """
+        Extends the path by moves in the direction given as a unit
+        vector, see DIRECTIONS.
+        """
+        if moves == 0:
+            return
+        x, y = self._x[-1], self._y[-1]
+        line = (0, y) if direction[1] == 0 else (1, x)
+        self._lines.setdefault(line, array('q')).append(len(self._x) - 1)
+        self._x.append(x + direction[0] * moves)
+        self._y.append(y + direction[1] * moves)
+        self._steps.append(self._steps[-1] + moves)
+
+    def segment(self, index):
+        """
+        Returns the segment of the path after its index-th turn.
+        """
+        return Segment((self._x[index], self._y[index]),
+                       (self._x[index + 1], self._y[index + 1]), self._steps[index])
+
+    @property
+    def segments(self):
+        return [self.segment(index) for index in range(len(self._x) - 1)]
 
     def __iter__(self):
-        for point in self._points:
-            yield point
+        for segment in self.segments:
+            x, y = segment.start
+            dx = (segment.end[0] - x) // manhatten(segment.end, segment.start)
+            dy = (segment.end[1] - y) // manhatten(segment.end, segment.start)
+            while (x, y) != segment.end:
+                x += dx
+                y += dy
+                yield (x, y)
 
     def steps_to(self, point):
-        return self._points.index(point) + 1
+        """
+        Returns the steps to the first visit of a point. Only the
+        segments on the horizontal and vertical line through the point
+        are looked at, in the order the wire visits them.
+        """
+        steps = []
+        for line in ((0, point[1]), (1, point[0])):
+            for index in self._lines.get(line, ()):
+                segment = self.segment(index)
+                if point in segment:
+                    steps.append(segment.steps_to(point))
+                    break
+        if not steps:
+            raise ValueError("{} is not on the wire".format(point))
+        return min(steps)
 
 
-if __name__ == '__main__':
-    with open('inputs/input_day03.in') as file:
-        lines = file.readlines()
+def read_wires(source, block_size=BLOCK_SIZE):
+    """
+    Yields a Wire for every non-empty path in source, built as the
+    source is parsed, see parse_moves.
+    """
+    wire = None
+    for direction, moves in parse_moves(source, block_size):
+        if direction is None:
+            if wire is not None:
+                yield wire
+            wire = None
+            continue
+        if wire is None:
+            wire = Wire()
+        wire.move(direction, moves)
+
 
-    wire_1 = Wire(lines[0])
-    wire_2 = Wire(lines[1])
-    panel = Panel(wire_1, wire_2)
+if __name__ == '__main__':
+    with open('inputs/input_day03.in', 'rb') as file:
+        panel = Panel(*read_wires(file))
     print("Part 1: ", panel.distance())
     print("Part 2: ", panel.minimum_steps_to_crossing())
@@ -1,3 +1,16 @@
+import sys
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Number of candidates per chunk of the batch validation.
+CHUNK_SIZE = 1 << 16
+
+
 def two_adjacent_digits_same(number):
     """
     Returns true if number contains two adjacent digits
@@ -65,18 +78,116 @@ def two_adjacent_digits_same_2(number):
     return any(map(lambda x: x==2, digit_counts))
 
 
+def _paired(run, exact):
+    return run == 2 if exact else run >= 2
+
+
+def _count_up_to(bound, exact):
+    """
+    Returns the number of passwords from 1 to bound, see
+    count_passwords.
+    """
+    if bound <= 0:
+        return 0
+    limits = separate_digits(bound)
+
+    @lru_cache(maxsize=None)
+    def count(position, previous, run, paired, tight):
+        # previous is None while only leading zeros have been placed and
+        # run is the length of the group of the previous digit, where
+        # three stands for any longer group.
+        if position == len(limits):
+            return int(paired or _paired(run, exact))
+        limit = limits[position] if tight else 9
+        total = 0
+        if previous is None:
+            total += count(position + 1, None, 0, False, False)
+        for digit in range(1 if previous is None else previous, limit + 1):
+            if digit == previous:
+                total += count(position + 1, digit, min(run + 1, 3), paired, tight and digit == limit)
+            else:
+                total += count(position + 1, digit, 1, paired or _paired(run, exact),
+                               tight and digit == limit)
+        return total
+
+    return count(0, None, 0, False, True)
+
+
+def count_passwords(start, end, exact=False):
+    """
+    Returns the number of passwords from start to end with digits that
+    never decrease and two adjacent digits that are the same, or with
+    exact, two adjacent digits that are not part of a larger group.
+
+    Only non-decreasing digit sequences bounded by the range are
+    counted, digit by digit, so ranges of long passwords count as fast
+    as short ones.
+    """
+    if end < start:
+        return 0
+    return _count_up_to(end, exact) - _count_up_to(start - 1, exact)
+
+
+def digit_array(numbers, width):
+    """
+    Returns the digits of an array of numbers as rows of width digits,
+    most significant first. Leading zeros are replaced by increasing
+    negative values, so they neither decrease nor repeat.
+    """
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = numbers[:, None] // powers % 10
+    leading = np.maximum.accumulate(digits, axis=1) == 0
+    return np.where(leading, np.arange(width) - width, digits)
+
+
+def never_decrease_rows(digits):
+    """
+    Returns for every row of digits if its digits are non-decreasing.
+    """
+    return (np.diff(digits, axis=1) >= 0).all(axis=1)
+
+
+def two_adjacent_digits_same_rows(digits, exact=False):
+    """
+    Returns for every row of digits if two adjacent digits are the
+    same, or with exact, if such a pair is not part of a larger group.
+    """
+    same = np.diff(digits, axis=1) == 0
+    if not exact:
+        return same.any(axis=1)
+    padded = np.pad(same, ((0, 0), (1, 1)))
+    return (same & ~padded[:, :-2] & ~padded[:, 2:]).any(axis=1)
+
+
+def passwords(start, end, exact=False, chunk_size=CHUNK_SIZE):
+    """
+    Yields the passwords from start to end, see count_passwords, as
+    arrays of the passwords in every chunk of chunk_size candidates,
+    or as lists when NumPy is not installed.
+    """
+    if np is None:
+        check = two_adjacent_digits_same_2 if exact else two_adjacent_digits_same
+        for first in range(start, end + 1, chunk_size):
+            yield [password for password in range(first, min(first + chunk_size, end + 1))
+                   if check(password) and never_decrease(password)]
+        return
+
+    width = len(str(max(end, 1)))
+    for first in range(start, end + 1, chunk_size):
+        candidates = np.arange(first, min(first + chunk_size, end + 1), dtype=np.int64)
+        digits = digit_array(candidates, width)
+        valid = never_decrease_rows(digits) & two_adjacent_digits_same_rows(digits, exact)
+        yield candidates[valid]
+
+
 if __name__ == '__main__':
     input_data = '246540-787419'
     start, end = map(int, input_data.split('-'))
 
-    count = 0
-    for password in range(start, end + 1):
-        if two_adjacent_digits_same(password) and never_decrease(password):
-          count += 1
-    print("Part 01: ", count)
-
-    count = 0
-    for password in range(start, end + 1):
-        if two_adjacent_digits_same_2(password) and never_decrease(password):
-          count += 1
-    print("Part 02: ", count)
+    print("Part 01: ", count_passwords(start, end))
+    print("Part 02: ", count_passwords(start, end, exact=True))
+
+    if '--list' in sys.argv[1:]:
+        for chunk in passwords(start, end, exact=True):
+            for password in chunk:
+                print(password)
@@ -0,0 +1,96 @@
+import numpy as np
+
+from .engine import decode
+
+
+class BatchEngine:
+    """
+    Execution engine that runs many copies of a program in lockstep,
+    one lane per copy, with the memories held as rows of a 2-D int64
+    array. Lanes at the same address with the same code execute as one
+    array operation; lanes that diverge on jumps are grouped by address.
+
+    Values wrap around at 64 bits instead of growing arbitrarily.
+    """
+    def run(self, program, restores=None, inputs=None):
+        """
+        Run a lane per noun and verb pair in restores and/or per value
+        in inputs, which every input instruction of the lane reads,
+        from the current state of the program. Returns an array with
+        the result of every lane and a list of the outputs of every lane.
+        """
+        lanes = len(restores) if restores is not None else len(inputs)
+        memory = np.tile(np.array(list(program._program), dtype=np.int64), (lanes, 1))
+        if restores is not None:
+            memory[:, 1:3] = np.asarray(restores, dtype=np.int64)
+        if inputs is not None:
+            inputs = np.asarray(inputs, dtype=np.int64)
+
+        ip = np.full(lanes, program._instruction_pointer, dtype=np.int64)
+        running = np.arange(lanes)
+        outputs = [[] for _ in range(lanes)]
+
+        while running.size:
+            ips = ip[running]
+            codes = memory[running, ips]
+            if (ips == ips[0]).all() and (codes == codes[0]).all():
+                groups = [(running, int(ips[0]), int(codes[0]))]
+            else:
+                keys, inverse = np.unique(np.stack([ips, codes], axis=1), axis=0, return_inverse=True)
+                inverse = inverse.reshape(-1)
+                groups = [(running[inverse == i], int(address), int(code))
+                          for i, (address, code) in enumerate(keys)]
+
+            halted = []
+            for group, address, code in groups:
+                if self._step(memory, ip, group, address, code, inputs, outputs):
+                    halted.append(group)
+            if halted:
+                running = np.setdiff1d(running, np.concatenate(halted))
+
+        return memory[:, 0].copy(), outputs
+
+    def _step(self, memory, ip, lanes, address, code, inputs, outputs):
+        """
+        Execute the instruction at address for the given lanes and
+        returns true if it halts them.
+        """
+        _, _, mode_1, mode_2, _, size = decode(code)
+        opcode = code % 100
+        if opcode == 99:
+            return True
+
+        def operand(offset, mode):
+            value = memory[lanes, address + offset]
+            if mode:
+                return value
+            return memory[lanes, value]
+
+        if opcode in (1, 2, 7, 8):
+            a = operand(1, mode_1)
+            b = operand(2, mode_2)
+            if opcode == 1:
+                value = a + b
+            elif opcode == 2:
+                value = a * b
+            elif opcode == 7:
+                value = (a < b).astype(np.int64)
+            else:
+                value = (a == b).astype(np.int64)
+            memory[lanes, memory[lanes, address + 3]] = value
+        elif opcode == 3:
+            if inputs is None:
+                raise ValueError("Program reads input but no inputs were given")
+            memory[lanes, memory[lanes, address + 1]] = inputs[lanes]
+        elif opcode == 4:
+            for lane, value in zip(lanes.tolist(), operand(1, 0).tolist()):
+                outputs[lane].append(value)
+        else:
+            condition = operand(1, mode_1) != 0
+            if opcode == 6:
+                condition = ~condition
+            ip[lanes] = np.where(condition, operand(2, mode_2), address + size)
+            return False
+
+        ip[lanes] = address + size
+        return False
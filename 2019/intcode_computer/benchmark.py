@@ -0,0 +1,219 @@
+"""
+Benchmarks of the Intcode engines on synthetic workloads.
+
+Run from the 2019 directory:
+
+    python -m intcode_computer.benchmark [--baseline FILE] [--save FILE]
+
+Reports steps per second, speed relative to DecodedEngine, parse time
+and peak memory per engine and workload, and exits with status 1 when
+a result regresses against the baseline, benchmark_baseline.json by
+default, by more than the tolerance. Speed is compared relative to
+DecodedEngine, so a baseline holds on machines of any speed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from .channels import input_source
+from .compiler import CompiledEngine
+from .engine import DecodedEngine, Machine
+from .fusion import FusedEngine
+from .profiler import Profiler
+from .program import Program
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+
+
+def arithmetic_loop(iterations):
+    """
+    Tight loop of an add, a multiply and a countdown, outputting the
+    sum of the counter values.
+    """
+    return "1,18,20,18,1002,19,1,19,1001,20,-1,20,1005,20,0,4,18,99,0,1,{}".format(iterations)
+
+
+def branch_heavy(iterations):
+    """
+    Loop that alternates between two branches, outputting how often
+    each branch was taken.
+    """
+    return ("1008,30,0,30,1005,30,14,1001,31,1,31,1105,1,18,1001,32,1,32,"
+            "1001,33,-1,33,1005,33,0,4,31,4,32,99,0,0,0,{}").format(iterations)
+
+
+def io_heavy(iterations):
+    """
+    Loop reading a value and writing it doubled, once per iteration.
+    """
+    return "3,16,1002,16,2,17,4,17,1001,18,-1,18,1005,18,0,99,0,0,{}".format(iterations)
+
+
+def self_modifying(iterations):
+    """
+    Loop that toggles one of its own instructions between add and
+    multiply on every iteration.
+    """
+    return ("1002,8,-1,22,1001,22,3,8,1,23,24,23,1001,25,-1,25,1005,25,0,"
+            "4,23,99,0,0,1,{}").format(iterations)
+
+
+def large_image(cells, iterations=1000):
+    """
+    Arithmetic loop followed by a large image of data cells.
+    """
+    data = ",".join(str(1000 + i) for i in range(cells))
+    return "{},{}".format(arithmetic_loop(iterations), data)
+
+
+WORKLOADS = {
+    'arithmetic': lambda scale: (arithmetic_loop(20000 * scale), None),
+    'branches': lambda scale: (branch_heavy(20000 * scale), None),
+    'io': lambda scale: (io_heavy(10000 * scale), range(10000 * scale)),
+    'self-modifying': lambda scale: (self_modifying(10000 * scale), None),
+    'large-image': lambda scale: (large_image(200000 * scale), None),
+}
+
+ENGINES = {
+    'decoded': DecodedEngine,
+    'fused': FusedEngine,
+    'compiled': CompiledEngine,
+}
+
+# Engine the speed of the others is compared to.
+REFERENCE = 'decoded'
+
+
+def _execute(engine_type, program, inputs):
+    outputs = []
+    machine = Machine(input_source(inputs if inputs is not None else ()), outputs.append)
+    engine_type().execute(program, machine)
+    return outputs
+
+
+def measure(source, inputs, engines=ENGINES, repeat=5):
+    """
+    Returns the parse time, steps per second and peak traced memory of
+    running source with every engine as {engine: measurement}, taking
+    the best time of repeat runs. The runs of the engines alternate, so
+    a change in machine load affects them alike.
+
+    Speed is also given relative to the REFERENCE engine, which unlike
+    steps per second can be compared across machines.
+    """
+    profiler = Profiler()
+    DecodedEngine(profiler=profiler).execute(
+        Program(source), Machine(input_source(inputs if inputs is not None else ()), list().append))
+
+    parse_time = dict.fromkeys(engines, float('inf'))
+    elapsed = dict.fromkeys(engines, float('inf'))
+    for _ in range(repeat):
+        for engine, engine_type in engines.items():
+            start = time.perf_counter()
+            program = Program(source)
+            parse_time[engine] = min(parse_time[engine], time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _execute(engine_type, program, inputs)
+            elapsed[engine] = min(elapsed[engine], time.perf_counter() - start)
+
+    results = {}
+    for engine, engine_type in engines.items():
+        tracemalloc.start()
+        try:
+            _execute(engine_type, Program(source), inputs)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        results[engine] = {
+            'steps': profiler.steps,
+            'steps_per_second': profiler.steps / elapsed[engine] if elapsed[engine] else float('inf'),
+            'parse_time': parse_time[engine],
+            'peak_memory': peak_memory,
+        }
+
+    if REFERENCE in results:
+        reference = results[REFERENCE]['steps_per_second']
+        for result in results.values():
+            result['relative'] = result['steps_per_second'] / reference
+    return results
+
+
+def run(workloads=WORKLOADS, engines=ENGINES, scale=1, repeat=5):
+    """
+    Returns the measurements of every engine on every workload as
+    {workload: {engine: measurement}}.
+    """
+    results = {}
+    for name, workload in workloads.items():
+        source, inputs = workload(scale)
+        results[name] = measure(source, inputs, engines, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Returns descriptions of the results that are slower relative to the
+    REFERENCE engine or use more memory than the baseline by more than
+    the tolerance.
+    """
+    regressions = []
+    for workload, engines in results.items():
+        for engine, result in engines.items():
+            expected = baseline.get(workload, {}).get(engine)
+            if expected is None:
+                continue
+            if 'relative' in result and 'relative' in expected and \
+                    result['relative'] < expected['relative'] * (1 - tolerance):
+                regressions.append("{} {}: {:.2f}x {}, baseline {:.2f}x".format(
+                    workload, engine, result['relative'], REFERENCE, expected['relative']))
+            if result['peak_memory'] > expected['peak_memory'] * (1 + tolerance):
+                regressions.append("{} {}: {} B peak memory, baseline {}".format(
+                    workload, engine, result['peak_memory'], expected['peak_memory']))
+    return regressions
+
+
+def report(results):
+    lines = ["{:<16}{:<10}{:>14}{:>10}{:>12}{:>14}".format(
+        "Workload", "Engine", "Steps/s", "Relative", "Parse (ms)", "Peak (KiB)")]
+    for workload, engines in results.items():
+        for engine, result in engines.items():
+            lines.append("{:<16}{:<10}{:>14.0f}{:>10.2f}{:>12.2f}{:>14.1f}".format(
+                workload, engine, result['steps_per_second'], result.get('relative', 1.0),
+                result['parse_time'] * 1000, result['peak_memory'] / 1024))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Intcode engines.")
+    parser.add_argument('--baseline', default=BASELINE,
+                        help="JSON file of results to compare against")
+    parser.add_argument('--save', help="write the results as JSON to this file")
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(scale=args.scale, repeat=args.repeat)
+    print(report(results))
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("Regression:", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
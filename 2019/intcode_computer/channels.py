@@ -0,0 +1,62 @@
+from asyncio import QueueEmpty
+from inspect import GEN_CREATED, getgeneratorstate
+from queue import Empty
+
+from .engine import WaitingForInput
+
+
+def input_source(source):
+    """
+    Returns a callable reading the next input from source, which may be
+    a callable, a queue, an iterable or a single value that is read by
+    every input instruction. A source that has no value available
+    raises WaitingForInput.
+    """
+    if isinstance(source, (str, bytes, bytearray)):
+        raise TypeError("Input source must provide integers, not text")
+
+    if callable(source):
+        return source
+
+    if hasattr(source, 'get_nowait'):
+        def read():
+            try:
+                return source.get_nowait()
+            except (Empty, QueueEmpty):
+                raise WaitingForInput()
+        return read
+
+    if hasattr(source, '__iter__'):
+        iterator = iter(source)
+
+        def read():
+            try:
+                return next(iterator)
+            except StopIteration:
+                raise WaitingForInput()
+        return read
+
+    return lambda: source
+
+
+def output_sink(sink):
+    """
+    Returns a callable writing an output to sink, which may be a
+    callable, a list, a queue or a generator that receives the outputs
+    through send.
+    """
+    if hasattr(sink, 'send'):
+        if getgeneratorstate(sink) == GEN_CREATED:
+            next(sink)
+        return sink.send
+
+    if callable(sink):
+        return sink
+
+    if hasattr(sink, 'put_nowait'):
+        return sink.put_nowait
+
+    if hasattr(sink, 'put'):
+        return sink.put
+
+    return sink.append
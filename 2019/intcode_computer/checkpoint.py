@@ -0,0 +1,148 @@
+import os
+import struct
+import zlib
+from array import array
+
+from .program import Program
+
+
+MAGIC = b'ICVM'
+VERSION = 1
+
+# Values are stored as 64 bit integers, or as variable length integers
+# when a value does not fit.
+INT64 = 0
+VARINT = 1
+
+# Magic, version, encoding, instruction pointer, steps and the number of
+# memory cells, inputs, outputs and cells past the memory.
+HEADER = struct.Struct('<4sBBqQIIII')
+
+
+def _encode_varints(values):
+    data = bytearray()
+    for value in values:
+        value = value * 2 if value >= 0 else -value * 2 - 1
+        while value > 0x7f:
+            data.append(value & 0x7f | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+def _decode_varints(data):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value // 2 if value % 2 == 0 else -(value + 1) // 2)
+            value = shift = 0
+    return values
+
+
+class Checkpoint:
+    """
+    State of a VM: the program memory and instruction pointer, the
+    inputs not consumed yet, the outputs written so far and the number
+    of steps executed.
+
+    A restored program has the checkpointed memory as its image, so
+    resetting it returns to the checkpoint. Cells written past the
+    memory, see ArrayMemory, are restored as written cells.
+    """
+    def __init__(self, program, steps=0, inputs=(), outputs=()):
+        self.program = program
+        self.steps = steps
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def to_bytes(self):
+        """
+        Returns the checkpoint in its compressed binary form.
+        """
+        memory = self.program._program
+        size = len(memory)
+        sparse = sorted(address for address in self.program._dirty if address >= size)
+        values = list(memory) + self.inputs + self.outputs
+        for address in sparse:
+            values.extend((address, memory[address]))
+
+        try:
+            encoding, payload = INT64, array('q', values).tobytes()
+        except OverflowError:
+            encoding, payload = VARINT, _encode_varints(values)
+        header = HEADER.pack(MAGIC, VERSION, encoding, self.program._instruction_pointer,
+                             self.steps, size, len(self.inputs), len(self.outputs), len(sparse))
+        return header + zlib.compress(payload, 1)
+
+    @classmethod
+    def from_bytes(cls, data, memory=list):
+        """
+        Returns the checkpoint stored in data, restoring the program
+        with the memory factory, see Program.
+        """
+        magic, version, encoding, ip, steps, size, inputs, outputs, sparse = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a checkpoint")
+
+        payload = zlib.decompress(data[HEADER.size:])
+        if encoding == INT64:
+            values = array('q')
+            values.frombytes(payload)
+        else:
+            values = _decode_varints(payload)
+
+        program = Program.from_values(values[:size], memory)
+        program._instruction_pointer = ip
+        start = size + inputs + outputs
+        for i in range(start, start + 2 * sparse, 2):
+            program.update_program(values[i], values[i + 1])
+        return cls(program, steps, values[size:size + inputs], values[size + inputs:start])
+
+    def save(self, path):
+        """
+        Write the checkpoint to path, replacing any previous checkpoint
+        only once it is complete.
+        """
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'wb') as file:
+            file.write(self.to_bytes())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, memory=list):
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read(), memory)
+
+
+class Checkpointer:
+    """
+    Periodic checkpoints of a run to path every given number of steps,
+    see Computer. The steps and outputs carry over from a resumed
+    checkpoint.
+    """
+    def __init__(self, path, every=1000000):
+        if every < 1:
+            raise ValueError("Checkpoints must be at least one step apart")
+        self.path = path
+        self.every = every
+        self.steps = 0
+        self.inputs = []
+        self.outputs = []
+
+    def save(self, program):
+        Checkpoint(program, self.steps, self.inputs, self.outputs).save(self.path)
+
+    def resume(self, memory=list):
+        """
+        Returns the program of the checkpoint at path, taking over its
+        steps, pending inputs and outputs.
+        """
+        checkpoint = Checkpoint.load(self.path, memory)
+        self.steps = checkpoint.steps
+        self.inputs = checkpoint.inputs
+        self.outputs = checkpoint.outputs
+        return checkpoint.program
@@ -0,0 +1,257 @@
+from operator import itemgetter
+
+from .engine import (
+    HALTED, PAUSED, PREEMPTED, WAITING, DecodedEngine, Machine, Pause, StepLimitExceeded,
+    WaitingForInput, decode, print_output)
+
+
+class Exit(Exception):
+    """
+    Raised by compiled code to leave the dispatch loop, carrying the
+    address execution resumes at and the status of the program. A None
+    status follows a write into compiled code.
+    """
+    def __init__(self, ip, status=None):
+        super().__init__(ip, status)
+        self.ip = ip
+        self.status = status
+
+
+def _operand(value, mode):
+    if mode:
+        return str(value)
+    return "m[{}]".format(value)
+
+
+class CompiledProgram:
+    """
+    Python translation of a program, starting at a given address.
+
+    Every instruction reachable through fall through and immediate
+    jumps becomes part of a basic block compiled to a Python function,
+    and a dispatch loop runs the blocks by address. Compiled code is
+    only valid while the cells it was translated from are unchanged.
+    """
+    def __init__(self, memory, entry):
+        self.entry = entry
+        self._code = {}
+        self._write_targets = set()
+
+        targets = [entry]
+        starts = set()
+        while targets:
+            start = targets.pop()
+            if start in starts or not 0 <= start < len(memory):
+                continue
+            starts.add(start)
+            targets.extend(self._scan(memory, start))
+
+        # Block bodies depend on the complete code region, so they are
+        # generated once every instruction is known.
+        self.starts = sorted(start for start in starts
+                             if next(self._instructions(memory, start), None))
+        lines = []
+        for start in self.starts:
+            lines.extend(self._block(memory, start))
+
+        lines.append("blocks = {%s}" % ", ".join(
+            "{0}: block_{0}".format(start) for start in self.starts))
+        lines.extend([
+            "def run(m, ip, read, write):",
+            "    get = blocks.get",
+            "    try:",
+            "        while True:",
+            "            block = get(ip)",
+            "            if block is None:",
+            "                return ip, None",
+            "            ip = block(m, read, write)",
+            "    except Exit as exit:",
+            "        return exit.ip, exit.status",
+        ])
+
+        self.source = "\n".join(lines) + "\n"
+        namespace = {
+            'Exit': Exit,
+            'Pause': Pause,
+            'WaitingForInput': WaitingForInput,
+            'HALTED': HALTED,
+            'PAUSED': PAUSED,
+            'WAITING': WAITING,
+        }
+        exec(compile(self.source, '<intcode>', 'exec'), namespace)
+        self.function = namespace['run']
+
+        addresses = sorted(self._code)
+        self._addresses = itemgetter(*addresses) if addresses else None
+        self._values = self._addresses(memory) if addresses else None
+        self.write_targets = frozenset(self._write_targets)
+
+    def _instructions(self, memory, start):
+        """
+        Yields (ip, entry) for the instructions of the block at start,
+        which ends with a jump or halt instruction.
+        """
+        ip = start
+        while 0 <= ip < len(memory):
+            try:
+                entry = decode(memory[ip])
+            except ValueError:
+                return
+            if ip + entry[5] > len(memory):
+                return
+            yield ip, entry
+            if entry[0] % 100 in (5, 6, 99):
+                return
+            ip += entry[5]
+
+    def _scan(self, memory, start):
+        """
+        Record the code cells of the block at start and returns the
+        addresses it may jump to.
+        """
+        for ip, entry in self._instructions(memory, start):
+            size = entry[5]
+            self._code.update((a, memory[a]) for a in range(ip, ip + size))
+            opcode = entry[0] % 100
+            if opcode in (1, 2, 7, 8):
+                self._write_targets.add(memory[ip + 3])
+            elif opcode == 3:
+                self._write_targets.add(memory[ip + 1])
+            elif opcode in (5, 6):
+                if entry[3]:
+                    yield memory[ip + 2]
+                yield ip + size
+
+    def _block(self, memory, start):
+        lines = ["def block_{}(m, read, write):".format(start)]
+        next_ip = start
+        for ip, entry in self._instructions(memory, start):
+            code, _, mode_1, mode_2, _, size = entry
+            opcode = code % 100
+            next_ip = ip + size
+            if opcode == 99:
+                lines.append("    raise Exit({}, HALTED)".format(ip))
+                return lines
+
+            a = _operand(memory[ip + 1], mode_1)
+            target = None
+
+            if opcode in (1, 2, 7, 8):
+                b = _operand(memory[ip + 2], mode_2)
+                target = memory[ip + 3]
+                expression = {
+                    1: "{} + {}",
+                    2: "{} * {}",
+                    7: "1 if {} < {} else 0",
+                    8: "1 if {} == {} else 0",
+                }[opcode].format(a, b)
+                lines.append("    m[{}] = {}".format(target, expression))
+            elif opcode == 3:
+                target = memory[ip + 1]
+                lines.append("    try:")
+                lines.append("        m[{}] = read()".format(target))
+                lines.append("    except WaitingForInput:")
+                lines.append("        raise Exit({}, WAITING)".format(ip))
+            elif opcode == 4:
+                lines.append("    try:")
+                lines.append("        write(m[{}])".format(memory[ip + 1]))
+                lines.append("    except Pause:")
+                lines.append("        raise Exit({}, PAUSED)".format(next_ip))
+            else:
+                b = _operand(memory[ip + 2], mode_2)
+                condition = "!=" if opcode == 5 else "=="
+                lines.append("    if {} {} 0:".format(a, condition))
+                lines.append("        return {}".format(b))
+
+            if target in self._code:
+                lines.append("    raise Exit({})".format(next_ip))
+                return lines
+
+        lines.append("    return {}".format(next_ip))
+        return lines
+
+    def matches(self, memory):
+        """
+        Returns true if the code cells in memory are those the program
+        was compiled from.
+        """
+        if self._addresses is None:
+            return True
+        try:
+            return self._addresses(memory) == self._values
+        except IndexError:
+            return False
+
+
+class CompiledEngine:
+    """
+    Execution engine that runs programs translated to Python.
+
+    Translations are cached per entry address and reused while the
+    code cells are unchanged. When the program writes into its own code
+    or jumps to an address that was not compiled, the program is
+    translated again from there, up to recompile_limit times before the
+    interpreter finishes the run.
+    """
+    cache_size = 8
+    recompile_limit = 16
+
+    def __init__(self, output=print_output):
+        self._output = output
+        self._interpreter = DecodedEngine()
+        self._cache = {}
+
+    def __getstate__(self):
+        # Compiled functions are rebuilt by the copy, e.g. in sweep workers.
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
+
+    def compiled(self, program):
+        """
+        Returns the CompiledProgram for the current state of the program.
+        """
+        memory = program._program
+        entry = program._instruction_pointer
+        candidates = self._cache.setdefault(entry, [])
+        for compiled in candidates:
+            if compiled.matches(memory):
+                return compiled
+
+        compiled = CompiledProgram(memory, entry)
+        candidates.insert(0, compiled)
+        del candidates[self.cache_size:]
+        return compiled
+
+    def run(self, program, input=None, max_steps=None):
+        """
+        Run the program to completion, reading input for every input
+        instruction, and returns the result. Raises StepLimitExceeded
+        if the program does not halt within max_steps instructions.
+        """
+        status = self.execute(program, Machine(lambda: input, self._output), max_steps)
+        if status == PREEMPTED:
+            raise StepLimitExceeded("Program did not halt within {} steps".format(max_steps))
+        return program.result()
+
+    def execute(self, program, machine, max_steps=None):
+        """
+        Execute the program with the I/O of the machine until it halts,
+        waits for input or is paused by the output sink, and returns
+        the status. Compiled blocks do not count instructions, so runs
+        with a step budget are left to the interpreter.
+        """
+        if max_steps is not None:
+            return self._interpreter.execute(program, machine, max_steps)
+        for _ in range(self.recompile_limit):
+            compiled = self.compiled(program)
+            if not compiled.starts:
+                break
+            # Cells that may be written are marked up front instead of per write.
+            program._dirty.update(compiled.write_targets)
+            ip, status = compiled.function(
+                program._program, program._instruction_pointer, machine.input, machine.output)
+            program._instruction_pointer = ip
+            if status is not None:
+                return status
+        return self._interpreter.execute(program, machine)
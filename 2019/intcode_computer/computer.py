@@ -1,11 +1,203 @@
+import os
+from itertools import islice
+from multiprocessing import Pool
+
+from .channels import input_source, output_sink
+from .engine import (
+    PAUSED, PREEMPTED, DecodedEngine, Machine, Pause, StepLimitExceeded, print_output)
+
+
+# Program copy and engine owned by a sweep worker process.
+_worker_program = None
+_worker_engine = None
+
+
+def _init_worker(program, engine):
+    global _worker_program, _worker_engine
+    _worker_program = program
+    _worker_engine = engine
+
+
+def _run_case(case):
+    """
+    Run a single (restore, diagnostic_id) case from the initial state of
+    the worker program and return (case, result, outputs).
+    """
+    restore, diagnostic_id = case
+    program = _worker_program
+    program.reset()
+    if restore is not None:
+        program.restore(*restore)
+
+    outputs = []
+    _worker_engine.execute(program, Machine(lambda: diagnostic_id, outputs.append))
+    return case, program.result(), outputs
+
+
 class Computer:
     """
     A computer to execute the program.
+
+    An optional engine replaces the default instruction by instruction
+    interpreter, see intcode_computer.engine. A profiler or trace runs
+    the program in a DecodedEngine recording into them. With a Memo,
+    see intcode_computer.memo, repeated runs from the same state with
+    the same input are replayed instead of executed. A Checkpointer,
+    see intcode_computer.checkpoint, saves the state of runs
+    periodically so they can be resumed. Such runs are always executed
+    and never replayed from the memo.
     """
-    def __init__(self, program):
+    def __init__(self, program, engine=None, profiler=None, trace=None, memo=None,
+                 checkpointer=None):
+        if profiler is not None or trace is not None:
+            if engine is not None:
+                raise ValueError("A profiler or trace can not be combined with an engine")
+            engine = DecodedEngine(profiler=profiler, trace=trace)
         self._program = program
+        self._engine = engine
+        self._memo = memo
+        self._checkpointer = checkpointer
+
+    @classmethod
+    def resume(cls, checkpointer, engine=None, memory=list):
+        """
+        Returns a computer continuing the run checkpointed by the
+        checkpointer. Running it without a diagnostic_id reads the
+        checkpointed input.
+        """
+        return cls(checkpointer.resume(memory), engine, checkpointer=checkpointer)
+
+    def run(self, diagnostic_id = None, max_steps=None):
+        """
+        Run the program to completion and returns the result. With
+        max_steps, raises StepLimitExceeded if the program does not halt
+        within that many instructions, leaving it resumable with step or
+        execute.
+        """
+        if self._checkpointer is not None:
+            return self._run_checkpointed(diagnostic_id, max_steps)
+        if self._memo is not None:
+            return self._run_memoized(diagnostic_id, max_steps)
+        if self._engine is not None or max_steps is not None:
+            return self._streaming_engine().run(self._program, diagnostic_id, max_steps)
 
-    def run(self, diagnostic_id = None):
         for instruction in self._program:
             self._program.execute(instruction, diagnostic_id)
         return self._program.result()
+
+    def _run_memoized(self, diagnostic_id, max_steps):
+        engine = self._streaming_engine()
+        key = self._memo.key(self._program, diagnostic_id)
+        entry = self._memo.get(key)
+        if entry is None:
+            outputs = []
+            status = engine.execute(self._program, Machine(lambda: diagnostic_id, outputs.append), max_steps)
+            if status == PREEMPTED:
+                raise StepLimitExceeded("Program did not halt within {} steps".format(max_steps))
+            entry = self._memo.put(key, self._program, outputs)
+        self._memo.replay(entry, self._program, engine._output)
+        return self._program.result()
+
+    def _run_checkpointed(self, diagnostic_id, max_steps):
+        checkpointer = self._checkpointer
+        if diagnostic_id is None and checkpointer.inputs:
+            diagnostic_id = checkpointer.inputs[0]
+        checkpointer.inputs = [] if diagnostic_id is None else [diagnostic_id]
+        engine = self._streaming_engine()
+
+        def write(value):
+            checkpointer.outputs.append(value)
+            engine._output(value)
+
+        machine = Machine(lambda: diagnostic_id, write)
+        executed = 0
+        while True:
+            quantum = checkpointer.every
+            if max_steps is not None:
+                quantum = min(quantum, max_steps - executed)
+            status = engine.execute(self._program, machine, quantum)
+            executed += machine.steps
+            checkpointer.steps += machine.steps
+            if status != PREEMPTED:
+                return self._program.result()
+            checkpointer.save(self._program)
+            if max_steps is not None and executed >= max_steps:
+                raise StepLimitExceeded("Program did not halt within {} steps".format(max_steps))
+
+    def _streaming_engine(self):
+        if self._engine is not None:
+            return self._engine
+        return DecodedEngine()
+
+    def execute(self, inputs=(), outputs=print_output, max_steps=None):
+        """
+        Execute the program reading from the inputs source and writing
+        to the outputs sink, see intcode_computer.channels. Returns the
+        status of the program, which is resumable unless halted, and is
+        PREEMPTED when it ran for max_steps instructions.
+        """
+        machine = Machine(input_source(inputs), output_sink(outputs))
+        return self._streaming_engine().execute(self._program, machine, max_steps)
+
+    def step(self, n=1, inputs=(), outputs=print_output):
+        """
+        Execute at most n instructions of the program, see execute.
+        """
+        return self.execute(inputs, outputs, n)
+
+    def outputs(self, inputs=()):
+        """
+        Yields the outputs of the program as they are produced, reading
+        from the inputs source. Stops when the program halts or the
+        inputs run out, in which case the program can be resumed.
+        """
+        buffer = []
+
+        def write(value):
+            buffer.append(value)
+            raise Pause()
+
+        engine = self._streaming_engine()
+        machine = Machine(input_source(inputs), write)
+        while engine.execute(self._program, machine) == PAUSED:
+            yield buffer.pop()
+
+    def sweep(self, cases, processes=None, chunksize=64, ordered=True):
+        """
+        Evaluate (restore, diagnostic_id) cases across a process pool,
+        each from the initial state of the program with a copy of the
+        engine of this computer, or DecodedEngine if it has none, which
+        is pickled with its configuration. Yields tuples of
+        (case, result, outputs) in case order, or as they complete when
+        ordered is False.
+
+        Cases are taken from the iterable one batch of chunksize cases
+        per process at a time, so closing the generator stops both the
+        pool and the enumeration of cases.
+        """
+        engine = self._streaming_engine()
+        processes = processes or os.cpu_count() or 1
+        cases = iter(cases)
+        with Pool(processes, _init_worker, (self._program.fork(), engine)) as pool:
+            imap = pool.imap if ordered else pool.imap_unordered
+            while True:
+                batch = list(islice(cases, chunksize * processes))
+                if not batch:
+                    break
+                for result in imap(_run_case, batch, chunksize):
+                    yield result
+
+    def search(self, cases, target, processes=None, chunksize=64, ordered=True):
+        """
+        Returns the first (case, result, outputs) of the sweep whose
+        result equals target, or None. Remaining work is abandoned as
+        soon as a match is found.
+        """
+        sweep = self.sweep(cases, processes, chunksize, ordered)
+        try:
+            for case, result, outputs in sweep:
+                if result == target:
+                    return case, result, outputs
+        finally:
+            sweep.close()
+        return None
@@ -0,0 +1,84 @@
+"""
+Disassembler for Intcode programs.
+
+Run from the 2019 directory to print the listing of a program file,
+optionally after optimizing it, see intcode_computer.optimizer:
+
+    python -m intcode_computer.disassembler FILE [--optimize]
+"""
+import argparse
+
+from .engine import NAMES, WRITE_OFFSETS
+from .fusion import ControlFlowGraph
+from .instruction import get_modes
+from .optimizer import optimize
+from .program import Program
+
+
+def _operand(value, mode):
+    if mode:
+        return str(value)
+    return "[{}]".format(value)
+
+
+def instruction_text(memory, ip):
+    """
+    Returns the mnemonic and operands of the instruction at ip, with
+    position mode operands in brackets.
+    """
+    code = memory[ip]
+    opcode = code % 100
+    modes = get_modes(code)
+    name = NAMES[opcode]
+    if opcode == 99:
+        return name
+    if opcode == 3:
+        return "{:<14}-> [{}]".format(name, memory[ip + 1])
+    if opcode == 4:
+        return "{:<14}[{}]".format(name, memory[ip + 1])
+    if opcode in (5, 6):
+        return "{:<14}{}, {}".format(
+            name, _operand(memory[ip + 1], modes[0]), _operand(memory[ip + 2], modes[1]))
+    return "{:<14}{}, {} -> [{}]".format(
+        name, _operand(memory[ip + 1], modes[0]), _operand(memory[ip + 2], modes[1]),
+        memory[ip + WRITE_OFFSETS[opcode]])
+
+
+def disassemble(program):
+    """
+    Returns the listing of the program as lines of address and
+    instruction for the code reachable from its instruction pointer,
+    see ControlFlowGraph, and of address and value for other cells.
+    """
+    memory = program._program
+    graph = ControlFlowGraph(memory, program._instruction_pointer)
+    instructions = {ip: entry for block in graph.blocks.values() for ip, entry in block.instructions}
+
+    lines = []
+    ip = 0
+    while ip < len(memory):
+        entry = instructions.get(ip)
+        if entry is None:
+            lines.append("{:>6}: {:<14}{}".format(ip, "data", memory[ip]))
+            ip += 1
+        else:
+            lines.append("{:>6}: {}".format(ip, instruction_text(memory, ip)))
+            ip += entry[5]
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Disassemble an Intcode program.")
+    parser.add_argument('file')
+    parser.add_argument('--optimize', action='store_true')
+    args = parser.parse_args(argv)
+
+    with open(args.file) as file:
+        program = Program(file.read())
+    if args.optimize:
+        program = optimize(program)
+    print("\n".join(disassemble(program)))
+
+
+if __name__ == '__main__':
+    main()
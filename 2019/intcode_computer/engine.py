@@ -0,0 +1,359 @@
+from time import perf_counter
+
+from .instruction import get_modes
+
+
+# Status of a program when an engine returns from execute.
+HALTED = 'halted'
+WAITING = 'waiting'
+PAUSED = 'paused'
+PREEMPTED = 'preempted'
+
+
+class WaitingForInput(Exception):
+    """
+    Raised by an input source that has no value available yet. The
+    input instruction is executed again when the program is resumed.
+    """
+
+
+class Pause(Exception):
+    """
+    Raised by an output sink to suspend the program after the output
+    instruction.
+    """
+
+
+class StepLimitExceeded(Exception):
+    """
+    Raised when a program does not halt within its step budget. The
+    program is left resumable at the next instruction.
+    """
+
+
+def print_output(value):
+    """
+    Default output sink that prints the diagnostic code.
+    """
+    print("Diagnostic code: ", value)
+
+
+class Machine:
+    """
+    Per run state shared by the instruction handlers: the input source
+    and output sink of the run, the dirty cells of the program, the
+    instruction table the engine dispatches through and the number of
+    steps of the last budgeted execute.
+    """
+    __slots__ = ('input', 'output', 'dirty', 'table', 'steps')
+
+    def __init__(self, input, output):
+        self.input = input
+        self.output = output
+        self.dirty = None
+        self.table = None
+        self.steps = 0
+
+
+def _add(machine, memory, ip, entry):
+    a = memory[ip + 1]
+    if not entry[2]:
+        a = memory[a]
+    b = memory[ip + 2]
+    if not entry[3]:
+        b = memory[b]
+    target = memory[ip + 3]
+    memory[target] = a + b
+    machine.dirty.add(target)
+    return ip + 4
+
+
+def _multiply(machine, memory, ip, entry):
+    a = memory[ip + 1]
+    if not entry[2]:
+        a = memory[a]
+    b = memory[ip + 2]
+    if not entry[3]:
+        b = memory[b]
+    target = memory[ip + 3]
+    memory[target] = a * b
+    machine.dirty.add(target)
+    return ip + 4
+
+
+def _input(machine, memory, ip, entry):
+    target = memory[ip + 1]
+    memory[target] = machine.input()
+    machine.dirty.add(target)
+    return ip + 2
+
+
+def _output(machine, memory, ip, entry):
+    machine.output(memory[memory[ip + 1]])
+    return ip + 2
+
+
+def _jump_if_true(machine, memory, ip, entry):
+    a = memory[ip + 1]
+    if not entry[2]:
+        a = memory[a]
+    if a != 0:
+        b = memory[ip + 2]
+        if not entry[3]:
+            b = memory[b]
+        return b
+    return ip + 3
+
+
+def _jump_if_false(machine, memory, ip, entry):
+    a = memory[ip + 1]
+    if not entry[2]:
+        a = memory[a]
+    if a == 0:
+        b = memory[ip + 2]
+        if not entry[3]:
+            b = memory[b]
+        return b
+    return ip + 3
+
+
+def _less_than(machine, memory, ip, entry):
+    a = memory[ip + 1]
+    if not entry[2]:
+        a = memory[a]
+    b = memory[ip + 2]
+    if not entry[3]:
+        b = memory[b]
+    target = memory[ip + 3]
+    memory[target] = 1 if a < b else 0
+    machine.dirty.add(target)
+    return ip + 4
+
+
+def _equals(machine, memory, ip, entry):
+    a = memory[ip + 1]
+    if not entry[2]:
+        a = memory[a]
+    b = memory[ip + 2]
+    if not entry[3]:
+        b = memory[b]
+    target = memory[ip + 3]
+    memory[target] = 1 if a == b else 0
+    machine.dirty.add(target)
+    return ip + 4
+
+
+# Flat handler table indexed by opcode, None marks the halt instruction.
+HANDLERS = [None] * 100
+HANDLERS[1] = _add
+HANDLERS[2] = _multiply
+HANDLERS[3] = _input
+HANDLERS[4] = _output
+HANDLERS[5] = _jump_if_true
+HANDLERS[6] = _jump_if_false
+HANDLERS[7] = _less_than
+HANDLERS[8] = _equals
+
+NAMES = {
+    1: 'add',
+    2: 'multiply',
+    3: 'input',
+    4: 'output',
+    5: 'jump-if-true',
+    6: 'jump-if-false',
+    7: 'less-than',
+    8: 'equals',
+    99: 'halt',
+}
+
+# Offset of the operand holding the address an opcode writes to.
+WRITE_OFFSETS = {1: 3, 2: 3, 3: 1, 7: 3, 8: 3}
+
+SIZES = [0] * 100
+SIZES[1] = SIZES[2] = SIZES[7] = SIZES[8] = 4
+SIZES[3] = SIZES[4] = 2
+SIZES[5] = SIZES[6] = 3
+SIZES[99] = 1
+
+
+def decode(code):
+    """
+    Decode an instruction code into a table entry of the form
+    (code, handler, mode_1, mode_2, mode_3, size).
+    """
+    opcode = code % 100
+    if opcode != 99 and HANDLERS[opcode] is None:
+        raise ValueError("Unrecognised opcode")
+
+    modes = get_modes(code)
+    if modes is None or any(mode not in (0, 1) for mode in modes):
+        raise ValueError("Unrecognised mode")
+
+    return (code, HANDLERS[opcode], modes[0], modes[1], modes[2], SIZES[opcode])
+
+
+class DecodedEngine:
+    """
+    Execution engine that decodes every instruction address once into
+    a table and dispatches through a flat handler table.
+
+    A table entry remembers the code it was decoded from so that an
+    address overwritten by the program is decoded again. With a
+    profiler or trace, see intcode_computer.profiler and
+    intcode_computer.trace, programs run in a separate instrumented
+    loop so the plain loop pays nothing for them.
+    """
+    def __init__(self, output=print_output, profiler=None, trace=None):
+        self._output = output
+        self._profiler = profiler
+        self._trace = trace
+
+    def run(self, program, input=None, max_steps=None):
+        """
+        Run the program to completion, reading input for every input
+        instruction, and returns the result. Raises StepLimitExceeded
+        if the program does not halt within max_steps instructions.
+        """
+        status = self.execute(program, Machine(lambda: input, self._output), max_steps)
+        if status == PREEMPTED:
+            raise StepLimitExceeded("Program did not halt within {} steps".format(max_steps))
+        return program.result()
+
+    def execute(self, program, machine, max_steps=None):
+        """
+        Execute the program with the I/O of the machine until it halts,
+        waits for input or is paused by the output sink, and returns
+        the status.
+
+        With max_steps, at most that many instructions are executed and
+        the status is PREEMPTED when the budget runs out first. The
+        steps executed are counted in machine.steps.
+        """
+        if self._profiler is not None or self._trace is not None:
+            return self._execute_instrumented(program, machine, max_steps)
+        if max_steps is not None:
+            return self._execute_budgeted(program, machine, max_steps)
+
+        machine.dirty = program._dirty
+        machine.table = table = self._table(program)
+        memory = program._program
+        ip = program._instruction_pointer
+        status = HALTED
+
+        try:
+            while True:
+                code = memory[ip]
+                entry = table.get(ip)
+                if entry is None or entry[0] != code:
+                    entry = table[ip] = decode(code)
+                handler = entry[1]
+                if handler is None:
+                    break
+                ip = handler(machine, memory, ip, entry)
+        except WaitingForInput:
+            status = WAITING
+        except Pause:
+            ip += entry[5]
+            status = PAUSED
+
+        program._instruction_pointer = ip
+        return status
+
+    def _table(self, program):
+        """
+        Returns the instruction table of the program, a dict of entries
+        by address.
+        """
+        return program._decoded
+
+    def _execute_budgeted(self, program, machine, max_steps):
+        # Fused entries execute several instructions, so budgets are
+        # counted on the plain table.
+        machine.dirty = program._dirty
+        machine.table = table = program._decoded
+        memory = program._program
+        ip = program._instruction_pointer
+        steps = 0
+        status = PREEMPTED
+
+        try:
+            while steps < max_steps:
+                code = memory[ip]
+                entry = table.get(ip)
+                if entry is None or entry[0] != code:
+                    entry = table[ip] = decode(code)
+                handler = entry[1]
+                if handler is None:
+                    status = HALTED
+                    break
+                ip = handler(machine, memory, ip, entry)
+                steps += 1
+        except WaitingForInput:
+            status = WAITING
+        except Pause:
+            ip += entry[5]
+            steps += 1
+            status = PAUSED
+
+        program._instruction_pointer = ip
+        machine.steps = steps
+        return status
+
+    def _execute_instrumented(self, program, machine, max_steps=None):
+        profiler = self._profiler
+        trace = self._trace
+        clock = perf_counter
+        machine.dirty = program._dirty
+        machine.table = table = program._decoded
+        memory = program._program
+        ip = program._instruction_pointer
+        limit = float('inf') if max_steps is None else max_steps
+        steps = 0
+        status = HALTED
+        started = clock()
+
+        def record(ip, entry, target, old, elapsed):
+            opcode = entry[0] % 100
+            if profiler is not None:
+                profiler.record(ip, opcode, elapsed, target)
+            if trace is not None:
+                write = None if target is None else (target, old, memory[target])
+                output = memory[memory[ip + 1]] if opcode == 4 else None
+                trace.record(ip, entry[0], memory[ip + 1:ip + entry[5]], write, output)
+
+        try:
+            while True:
+                if steps >= limit:
+                    status = PREEMPTED
+                    break
+                code = memory[ip]
+                entry = table.get(ip)
+                if entry is None or entry[0] != code:
+                    entry = table[ip] = decode(code)
+                handler = entry[1]
+                if handler is None:
+                    break
+                offset = WRITE_OFFSETS.get(code % 100)
+                target = old = None
+                if offset:
+                    target = memory[ip + offset]
+                    old = memory[target]
+                start = clock()
+                next_ip = handler(machine, memory, ip, entry)
+                record(ip, entry, target, old, clock() - start)
+                ip = next_ip
+                steps += 1
+        except WaitingForInput:
+            status = WAITING
+        except Pause:
+            record(ip, entry, None, None, 0.0)
+            ip += entry[5]
+            steps += 1
+            status = PAUSED
+        finally:
+            if profiler is not None:
+                profiler.wall_time += clock() - started
+
+        program._instruction_pointer = ip
+        machine.steps = steps
+        return status
@@ -0,0 +1,225 @@
+from weakref import WeakKeyDictionary
+
+from .engine import DecodedEngine, decode, print_output
+
+
+class BasicBlock:
+    """
+    Straight line sequence of instructions entered only at its start.
+    """
+    def __init__(self, start):
+        self.start = start
+        self.instructions = []
+        self.successors = []
+
+    @property
+    def end(self):
+        """
+        Address following the last instruction of the block.
+        """
+        ip, entry = self.instructions[-1]
+        return ip + entry[5]
+
+
+class ControlFlowGraph:
+    """
+    Basic blocks of the code reachable from an entry address through
+    fall through and immediate jumps. Blocks are split at jumps and at
+    the targets and fall through addresses of jumps. Jumps through
+    position mode operands have unknown targets and no edge.
+    """
+    def __init__(self, memory, entry=0):
+        instructions = {}
+        leaders = {entry}
+        pending = [entry]
+        while pending:
+            ip = pending.pop()
+            while 0 <= ip < len(memory) and ip not in instructions:
+                try:
+                    decoded = decode(memory[ip])
+                except ValueError:
+                    break
+                if ip + decoded[5] > len(memory):
+                    break
+                instructions[ip] = decoded
+                opcode = decoded[0] % 100
+                if opcode == 99:
+                    break
+                if opcode in (5, 6):
+                    targets = [ip + decoded[5]]
+                    if decoded[3]:
+                        targets.append(memory[ip + 2])
+                    leaders.update(targets)
+                    pending.extend(targets)
+                    break
+                ip += decoded[5]
+
+        self.blocks = {}
+        for leader in sorted(leaders):
+            if leader not in instructions:
+                continue
+            block = self.blocks[leader] = BasicBlock(leader)
+            ip = leader
+            while ip in instructions:
+                decoded = instructions[ip]
+                block.instructions.append((ip, decoded))
+                ip += decoded[5]
+                opcode = decoded[0] % 100
+                if opcode == 99:
+                    break
+                if opcode in (5, 6):
+                    block.successors.append(ip)
+                    if decoded[3]:
+                        block.successors.append(memory[block.instructions[-1][0] + 2])
+                    break
+                if ip in leaders:
+                    block.successors.append(ip)
+                    break
+
+
+def _unfuse(machine, ip, entry, resume):
+    """
+    Replace the fused entry at ip by the plain entry of its first
+    instruction after a write into the code of a later instruction of
+    the run, and returns the address of that instruction.
+    """
+    machine.table[ip] = decode(entry[0])
+    return resume
+
+
+# Opcodes fused into runs. They do not read input or write output, so a
+# fused run never stops half way through on WaitingForInput or Pause.
+FUSABLE = (1, 2, 7, 8)
+
+_EXPRESSIONS = {
+    1: "{} + {}",
+    2: "{} * {}",
+    7: "1 if {} < {} else 0",
+    8: "1 if {} == {} else 0",
+}
+
+# Fused handlers by the codes of their run, shared by every program.
+_handlers = {}
+
+
+def _operand(offset, mode):
+    if mode:
+        return "m[ip + {}]".format(offset)
+    return "m[m[ip + {}]]".format(offset)
+
+
+def fused_handler(codes):
+    """
+    Returns the handler executing a run of instructions with the given
+    codes, arithmetic and comparisons optionally followed by a jump,
+    as a single Python function with the modes of every operand fixed.
+
+    Operands are read from memory when the run executes. After every
+    write the code of the next instruction is checked, and the entry is
+    unfused when the write changed it.
+    """
+    handler = _handlers.get(codes)
+    if handler is not None:
+        return handler
+
+    lines = ["def fused(machine, m, ip, entry):", "    dirty = machine.dirty"]
+    offset = 0
+    for index, code in enumerate(codes):
+        opcode = code % 100
+        _, _, mode_1, mode_2, _, size = decode(code)
+        if index:
+            lines.append("    if m[ip + {0}] != {1}:".format(offset, code))
+            lines.append("        return _unfuse(machine, ip, entry, ip + {})".format(offset))
+        a = _operand(offset + 1, mode_1)
+        b = _operand(offset + 2, mode_2)
+        if opcode in (5, 6):
+            condition = "!=" if opcode == 5 else "=="
+            lines.append("    if {} {} 0:".format(a, condition))
+            lines.append("        return {}".format(b))
+        else:
+            lines.append("    target = m[ip + {}]".format(offset + 3))
+            lines.append("    m[target] = {}".format(_EXPRESSIONS[opcode].format(a, b)))
+            lines.append("    dirty.add(target)")
+        offset += size
+    lines.append("    return ip + {}".format(offset))
+
+    namespace = {'_unfuse': _unfuse}
+    exec(compile("\n".join(lines) + "\n", '<fused>', 'exec'), namespace)
+    handler = _handlers[codes] = namespace['fused']
+    return handler
+
+
+def _runs(block):
+    """
+    Yields the runs of at least two instructions of the block that are
+    fused: arithmetic and comparisons, optionally followed by a jump.
+    """
+    run = []
+    for ip, entry in block.instructions:
+        opcode = entry[0] % 100
+        if opcode in FUSABLE:
+            run.append((ip, entry))
+            continue
+        if opcode in (5, 6) and run:
+            run.append((ip, entry))
+        if len(run) > 1:
+            yield run
+        run = []
+    if len(run) > 1:
+        yield run
+
+
+def fuse(graph):
+    """
+    Returns table entries by address for the runs of instructions in
+    the blocks of the graph, see fused_handler. A fused entry is the
+    entry of the first instruction of the run with the fused handler,
+    the size of the whole run and the codes of the run.
+    """
+    entries = {}
+    for block in graph.blocks.values():
+        for run in _runs(block):
+            ip, first = run[0]
+            codes = tuple(entry[0] for _, entry in run)
+            entries[ip] = (first[0], fused_handler(codes), first[2], first[3], first[4],
+                           sum(entry[5] for _, entry in run), codes)
+    return entries
+
+
+class FusedEngine(DecodedEngine):
+    """
+    Decoded engine that dispatches the runs of arithmetic and
+    comparisons in the basic blocks of a program, together with a
+    closing jump, as single fused handlers, see fused_handler.
+
+    The program is analysed from its instruction pointer on the first
+    run. A fused entry checks the code of every later instruction of
+    its run before executing it and is replaced by a plain entry when
+    the program wrote into it.
+    """
+    def __init__(self, output=print_output):
+        super().__init__(output)
+        self._tables = WeakKeyDictionary()
+
+    def __getstate__(self):
+        # Fused tables are rebuilt by the copy, e.g. in sweep workers.
+        state = self.__dict__.copy()
+        del state['_tables']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._tables = WeakKeyDictionary()
+
+    def graph(self, program):
+        """
+        Returns the ControlFlowGraph of the program from its current
+        instruction pointer.
+        """
+        return ControlFlowGraph(program._program, program._instruction_pointer)
+
+    def _table(self, program):
+        table = self._tables.get(program)
+        if table is None:
+            table = self._tables[program] = fuse(self.graph(program))
+        return table
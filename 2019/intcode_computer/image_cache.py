@@ -0,0 +1,94 @@
+import hashlib
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+
+
+def source_hash(source_code):
+    """
+    Returns the hex digest identifying the source code of a program.
+    """
+    return hashlib.blake2b(source_code.encode(), digest_size=16).hexdigest()
+
+
+class ImageCache:
+    """
+    Cache of parsed program images keyed by the hash of their source.
+
+    Images are kept in memory for the size most recently used sources
+    and, with a directory, stored on disk as native 64 bit integers
+    that are memory mapped instead of parsed when the memory cache
+    misses. ArrayMemory images read their pages from the mapping, see
+    ArrayMemory, other factories copy the mapped values. Images with
+    values that do not fit into 64 bits are only kept in memory.
+
+    Images are shared, so every program builds its own memory from one,
+    see Program.
+    """
+    def __init__(self, size=64, directory=None):
+        self.size = size
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+
+    def image(self, source_code, factory=tuple):
+        """
+        Returns the image of the source code built by factory, parsing
+        the source only if it is neither in memory nor on disk.
+        """
+        digest = source_hash(source_code)
+        key = (digest, factory)
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        values = self._load(digest)
+        if values is None:
+            values = [int(value) for value in source_code.split(',')]
+            self._store(digest, values)
+        image = self._images[key] = factory(values)
+        if len(self._images) > self.size:
+            self._images.popitem(last=False)
+        return image
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest + '.bin')
+
+    def _load(self, digest):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(digest), 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mapped) % 8:
+            mapped.close()
+            return None
+        # The view keeps the mapping open for as long as it is used.
+        return memoryview(mapped).cast('q')
+
+    def _store(self, digest, values):
+        if self.directory is None:
+            return
+        try:
+            data = array('q', values)
+        except OverflowError:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(digest)
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'wb') as file:
+            data.tofile(file)
+        os.replace(temporary, path)
+
+    def clear(self):
+        """
+        Forget the images held in memory.
+        """
+        self._images.clear()
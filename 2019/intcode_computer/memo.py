@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+
+class Memo:
+    """
+    Bounded LRU cache of the runs of deterministic programs, see
+    Computer.
+
+    A run is keyed on the hash of the program image, the cells written
+    before the run, such as restored nouns and verbs, the instruction
+    pointer and the input. An entry records the cells written by the
+    run, the final instruction pointer and the outputs, so a hit leaves
+    the program and the output sink as the run would have.
+    """
+    def __init__(self, size=1024):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def key(self, program, input=None):
+        """
+        Returns the key of running program from its current state with
+        the given input.
+        """
+        memory = program._program
+        state = frozenset((address, memory[address]) for address in program._dirty)
+        return program.digest(), state, program._instruction_pointer, input
+
+    def get(self, key):
+        """
+        Returns the entry of the key, or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, program, outputs):
+        """
+        Record the state of the program after a run and its outputs
+        under the key and returns the entry.
+        """
+        memory = program._program
+        cells = tuple((address, memory[address]) for address in program._dirty)
+        entry = self._entries[key] = (cells, program._instruction_pointer, tuple(outputs))
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def replay(self, entry, program, output):
+        """
+        Bring the program into the state recorded by the entry and write
+        its outputs to output.
+        """
+        cells, ip, outputs = entry
+        for address, value in cells:
+            program.update_program(address, value)
+        program._instruction_pointer = ip
+        for value in outputs:
+            output(value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
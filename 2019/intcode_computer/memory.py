@@ -0,0 +1,132 @@
+from array import array
+
+
+PAGE_SHIFT = 10
+PAGE_SIZE = 1 << PAGE_SHIFT
+PAGE_MASK = PAGE_SIZE - 1
+
+
+def _page(values):
+    """
+    Returns the values as an array of 64 bit integers, or as a list
+    when a value does not fit.
+    """
+    try:
+        return array('q', values)
+    except OverflowError:
+        return list(values)
+
+
+class ArrayMemory:
+    """
+    Program memory that stores the contiguous program image in pages of
+    64 bit integer arrays and addresses past the image in a sparse dict.
+    An image given as a memoryview of 64 bit integers, such as a memory
+    mapped file, is paged without copying.
+
+    Copies share their pages and a page is copied on its first write, so
+    a copy costs memory in proportion to the pages it touches. Unwritten
+    addresses past the image read as 0 and negative addresses raise
+    IndexError. Writing a value that does not fit into 64 bits promotes
+    its page to a list of arbitrary precision integers.
+    """
+    __slots__ = ('_pages', '_owned', '_size', '_sparse')
+
+    def __init__(self, values=()):
+        if isinstance(values, ArrayMemory):
+            values.copy_into(self)
+            return
+
+        if isinstance(values, memoryview):
+            # Pages of a read-only buffer are shared until written.
+            self._pages = [values[start:start + PAGE_SIZE]
+                           for start in range(0, len(values), PAGE_SIZE)]
+            self._owned = set()
+        else:
+            if not isinstance(values, array):
+                values = list(values)
+            self._pages = [_page(values[start:start + PAGE_SIZE])
+                           for start in range(0, len(values), PAGE_SIZE)]
+            self._owned = set(range(len(self._pages)))
+        self._size = len(values)
+        self._sparse = {}
+
+    @staticmethod
+    def image(values):
+        """
+        Returns the pristine program image, itself an ArrayMemory whose
+        pages are shared by every memory built from it.
+        """
+        return ArrayMemory(values)
+
+    def __getitem__(self, address):
+        try:
+            if 0 <= address < self._size:
+                return self._pages[address >> PAGE_SHIFT][address & PAGE_MASK]
+        except TypeError:
+            return self._slice(address)
+        if address < 0:
+            raise IndexError("Negative address")
+        return self._sparse.get(address, 0)
+
+    def _slice(self, addresses):
+        if (addresses.start or 0) < 0 or (addresses.stop or 0) < 0:
+            raise IndexError("Negative address")
+        return [self[address] for address in range(*addresses.indices(self._size))]
+
+    def __setitem__(self, address, value):
+        if address < 0:
+            raise IndexError("Negative address")
+        if address >= self._size:
+            self._sparse[address] = value
+            return
+
+        index = address >> PAGE_SHIFT
+        if index not in self._owned:
+            page = self._pages[index]
+            self._pages[index] = array('q', page) if isinstance(page, memoryview) else page[:]
+            self._owned.add(index)
+        page = self._pages[index]
+        try:
+            page[address & PAGE_MASK] = value
+        except OverflowError:
+            page = self._pages[index] = list(page)
+            page[address & PAGE_MASK] = value
+
+    def __delitem__(self, address):
+        """
+        Forget a cell past the program image.
+        """
+        if address < self._size:
+            raise IndexError("Cannot delete from the program image")
+        self._sparse.pop(address, None)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for page in self._pages:
+            yield from page
+
+    def copy_into(self, memory):
+        """
+        Make memory a copy of this memory that shares its pages.
+        """
+        # Pages become shared, so both memories copy them on write.
+        self._owned = set()
+        memory._pages = list(self._pages)
+        memory._owned = set()
+        memory._size = self._size
+        memory._sparse = dict(self._sparse)
+
+    def copy(self):
+        memory = ArrayMemory.__new__(ArrayMemory)
+        self.copy_into(memory)
+        return memory
+
+    @property
+    def promoted(self):
+        """
+        True if part of the image is stored with arbitrary precision.
+        """
+        return any(isinstance(page, list) for page in self._pages)
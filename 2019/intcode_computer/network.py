@@ -0,0 +1,122 @@
+import asyncio
+from collections import deque
+
+from .engine import WAITING, DecodedEngine, Machine, WaitingForInput
+
+
+class Deadlock(Exception):
+    """
+    Raised when every running computer of a network waits for input
+    that no other computer can produce.
+    """
+
+
+class Node:
+    """
+    A program of a network with its own input queue. Every output is
+    recorded in outputs and sent to the inputs of the connected nodes.
+    """
+    def __init__(self, network, program, engine=None):
+        self._network = network
+        self.program = program
+        self.engine = engine if engine is not None else DecodedEngine()
+        self.inputs = asyncio.Queue()
+        self.outputs = []
+        self._targets = []
+
+    def send(self, *values):
+        """
+        Queue values as input of the node.
+        """
+        for value in values:
+            self.inputs.put_nowait(value)
+
+    def connect(self, node):
+        """
+        Send the outputs of this node to the given node as well.
+        """
+        self._targets.append(node.inputs)
+
+    def _write(self, value):
+        self.outputs.append(value)
+        for target in self._targets:
+            target.put_nowait(value)
+
+    async def run(self):
+        """
+        Execute the program, suspending the task while the input queue
+        is empty, and returns the result once the program halts.
+        """
+        pending = deque()
+
+        def read():
+            if pending:
+                return pending.popleft()
+            try:
+                return self.inputs.get_nowait()
+            except asyncio.QueueEmpty:
+                raise WaitingForInput()
+
+        machine = Machine(read, self._write)
+        while self.engine.execute(self.program, machine) == WAITING:
+            pending.append(await self._network._wait(self))
+        self._network._halted(self)
+        return self.program.result()
+
+
+class Network:
+    """
+    Computers connected through input queues and run as asyncio tasks,
+    e.g. chains, feedback loops and fan-out of outputs. A computer only
+    runs when it has input to consume, without threads or polling.
+    """
+    def __init__(self):
+        self.nodes = []
+        self._running = set()
+        self._waiting = set()
+
+    def add(self, program, engine=None):
+        """
+        Add a program to the network and returns its Node.
+        """
+        node = Node(self, program, engine)
+        self.nodes.append(node)
+        return node
+
+    def connect(self, source, target):
+        source.connect(target)
+
+    def _check_deadlock(self):
+        """
+        Raise Deadlock when every running node waits for input and no
+        input is queued.
+        """
+        if self._waiting and self._waiting == self._running and \
+                all(node.inputs.empty() for node in self._waiting):
+            raise Deadlock("All computers are waiting for input")
+
+    async def _wait(self, node):
+        self._waiting.add(node)
+        self._check_deadlock()
+        try:
+            return await node.inputs.get()
+        finally:
+            self._waiting.discard(node)
+
+    def _halted(self, node):
+        self._running.discard(node)
+        self._check_deadlock()
+
+    async def run_async(self):
+        """
+        Run every node until it halts and returns their results in the
+        order the nodes were added.
+        """
+        self._running = set(self.nodes)
+        return await asyncio.gather(*(node.run() for node in self.nodes))
+
+    def run(self):
+        """
+        Run the network in a new event loop, see run_async.
+        """
+        return asyncio.run(self.run_async())
@@ -0,0 +1,261 @@
+from .engine import WRITE_OFFSETS, decode
+from .program import Program
+
+
+class _Analysis:
+    """
+    Static analysis of the code reachable from an entry address, valid
+    only when every address the code reads, writes and jumps to is
+    known, see analyse.
+    """
+    def __init__(self, memory, entry):
+        self.memory = memory
+        self.entry = entry
+        self.instructions = {}
+        self.code = set()
+        self.reads = set()
+        self.writers = {}
+        self.indirect = set()
+
+
+def _jump_target(memory, ip, entry):
+    target = memory[ip + 2]
+    return target if entry[3] else memory[target]
+
+
+def analyse(memory, entry=0):
+    """
+    Returns the _Analysis of the code reachable from entry, or None
+    when the code is not static: it writes into reachable code, jumps
+    through a cell that is written, overlaps, runs into cells that do
+    not decode or addresses cells past the memory.
+    """
+    analysis = _Analysis(memory, entry)
+    instructions = analysis.instructions
+    pending = [entry]
+    while pending:
+        ip = pending.pop()
+        while ip not in instructions:
+            if not 0 <= ip < len(memory):
+                return None
+            try:
+                decoded = decode(memory[ip])
+            except ValueError:
+                return None
+            if ip + decoded[5] > len(memory):
+                return None
+            instructions[ip] = decoded
+            opcode = decoded[0] % 100
+            if opcode == 99:
+                break
+            if opcode in (5, 6):
+                # Immediate conditions only take one of the branches.
+                taken = (memory[ip + 1] != 0) == (opcode == 5)
+                if not decoded[2] or taken:
+                    if not decoded[3]:
+                        if not 0 <= memory[ip + 2] < len(memory):
+                            return None
+                        analysis.indirect.add(memory[ip + 2])
+                    pending.append(_jump_target(memory, ip, decoded))
+                if decoded[2] and taken:
+                    break
+            ip += decoded[5]
+
+    for ip, decoded in instructions.items():
+        cells = set(range(ip, ip + decoded[5]))
+        if cells & analysis.code:
+            return None
+        analysis.code |= cells
+
+        opcode = decoded[0] % 100
+        if opcode in WRITE_OFFSETS:
+            analysis.writers.setdefault(memory[ip + WRITE_OFFSETS[opcode]], set()).add(ip)
+        if opcode == 4:
+            analysis.reads.add(memory[ip + 1])
+        elif opcode != 3:
+            for offset, mode in ((1, decoded[2]), (2, decoded[3])):
+                if not mode and offset < decoded[5]:
+                    analysis.reads.add(memory[ip + offset])
+
+    written = set(analysis.writers)
+    if analysis.code & written or analysis.indirect & written:
+        return None
+    if any(not 0 <= address < len(memory) for address in analysis.reads | written):
+        return None
+    return analysis
+
+
+def _value(memory, ip, offset, mode):
+    value = memory[ip + offset]
+    return value if mode else memory[value]
+
+
+def _fold(opcode, a, b):
+    if opcode == 1:
+        return a + b
+    if opcode == 2:
+        return a * b
+    if opcode == 7:
+        return 1 if a < b else 0
+    return 1 if a == b else 0
+
+
+def redundant_stores(analysis):
+    """
+    Returns the arithmetic and comparison instructions whose operands
+    are constant and that store the value the target already holds.
+
+    A cell is constant when every instruction writing it is such a
+    store, which is found as the greatest fixed point: the first store
+    that changed a constant cell would have had constant operands.
+    """
+    memory = analysis.memory
+    stores = {ip for ip, decoded in analysis.instructions.items()
+              if decoded[0] % 100 in (1, 2, 7, 8)}
+
+    def constant(address):
+        return analysis.writers.get(address, set()) <= stores
+
+    changed = True
+    while changed:
+        changed = False
+        for ip in list(stores):
+            decoded = analysis.instructions[ip]
+            operands = [(1, decoded[2]), (2, decoded[3])]
+            target = memory[ip + 3]
+            if constant(target) and all(mode or constant(memory[ip + offset])
+                                        for offset, mode in operands):
+                a = _value(memory, ip, 1, decoded[2])
+                b = _value(memory, ip, 2, decoded[3])
+                if _fold(decoded[0] % 100, a, b) == memory[target]:
+                    continue
+            stores.discard(ip)
+            changed = True
+    return stores, constant
+
+
+def optimize(program):
+    """
+    Returns an equivalent program, with the same result and outputs,
+    that executes fewer instructions and has a smaller image.
+
+    Redundant stores, stores to cells that are never read and
+    conditional jumps on constant conditions are removed or replaced by
+    unconditional jumps, unreachable cells are dropped and the rest are
+    relocated. Programs that are not static, see analyse, or that read
+    their own code as data are returned as they are.
+    """
+    memory = list(program._program)
+    entry = program._instruction_pointer
+    while True:
+        optimized = _optimize_once(memory, entry)
+        if optimized is None:
+            break
+        memory, entry = optimized
+
+    result = Program.from_values(memory)
+    result._instruction_pointer = entry
+    return result
+
+
+def _optimize_once(memory, entry):
+    """
+    Returns the memory and entry after one pass, or None if the pass
+    changed nothing.
+    """
+    analysis = analyse(memory, entry)
+    if analysis is None or analysis.reads & (analysis.code - {0}):
+        return None
+
+    instructions = analysis.instructions
+    first = instructions.get(0)
+    if first is not None and first[0] % 100 in (5, 6) and not first[3]:
+        # Cell 0 holds the result and is never rewritten.
+        return None
+    redundant, constant = redundant_stores(analysis)
+    referenced = {0} | analysis.reads | set(analysis.writers) | analysis.indirect
+    removed = set()
+    taken = set()
+    for ip, decoded in instructions.items():
+        opcode = decoded[0] % 100
+        if referenced.intersection(range(ip, ip + decoded[5])):
+            continue
+        if ip in redundant:
+            removed.add(ip)
+        elif opcode in (1, 2, 7, 8):
+            target = memory[ip + 3]
+            if target != 0 and target not in analysis.reads and target not in analysis.indirect:
+                removed.add(ip)
+        elif opcode in (5, 6) and (decoded[2] or constant(memory[ip + 1])):
+            condition = _value(memory, ip, 1, decoded[2]) != 0
+            if condition == (opcode == 5) and _jump_target(memory, ip, decoded) != ip + 3:
+                taken.add(ip)
+            else:
+                removed.add(ip)
+
+    kept = set(referenced)
+    for ip, decoded in instructions.items():
+        if ip not in removed:
+            kept.update(range(ip, ip + decoded[5]))
+    kept = sorted(address for address in kept if 0 <= address < len(memory))
+    address = {old: new for new, old in enumerate(kept)}
+
+    def jump(target):
+        while target in removed:
+            target += instructions[target][5]
+        return address[target]
+
+    def operand(ip, offset, mode):
+        """
+        Returns the mode and relocated value of an operand, folding
+        constant cells into immediate operands outside of cell 0.
+        """
+        value = memory[ip + offset]
+        if mode:
+            return 1, value
+        if ip != 0 and constant(value):
+            return 1, memory[value]
+        return 0, address[value]
+
+    optimized = []
+    ip = 0
+    for old in kept:
+        if old < ip:
+            continue
+        decoded = instructions.get(old)
+        if decoded is None or old in removed:
+            optimized.append(memory[old])
+            ip = old + 1
+            continue
+
+        opcode = decoded[0] % 100
+        code = memory[old]
+        if old in taken:
+            optimized.extend((1105, 1, jump(_jump_target(memory, old, decoded))))
+        elif opcode in (5, 6):
+            mode, condition = operand(old, 1, decoded[2])
+            if old != 0:
+                code = opcode + 100 * mode + 1000
+            target = _jump_target(memory, old, decoded)
+            if target not in instructions:
+                # A kept jump that is never taken, its target was dropped.
+                target = old + 3
+            optimized.extend((code, condition, jump(target)))
+        elif opcode in (3, 4):
+            optimized.extend((code, address[memory[old + 1]]))
+        elif opcode == 99:
+            optimized.append(code)
+        else:
+            (mode_1, a), (mode_2, b) = operand(old, 1, decoded[2]), operand(old, 2, decoded[3])
+            if old != 0:
+                if mode_1 and mode_2:
+                    # Both operands are constant, store the folded value.
+                    opcode, a, b = 1, _fold(opcode, a, b), 0
+                code = opcode + 100 * mode_1 + 1000 * mode_2
+            optimized.extend((code, a, b, address[memory[old + 3]]))
+        ip = old + decoded[5]
+
+    entry = jump(entry)
+    if optimized == memory and entry == analysis.entry:
+        return None
+    return optimized, entry
@@ -0,0 +1,59 @@
+import json
+from collections import Counter, defaultdict
+
+from .engine import NAMES
+
+
+class Profiler:
+    """
+    Execution statistics of programs run by a DecodedEngine created
+    with this profiler: executed steps, counts and time per opcode,
+    hits per address and writes per address.
+    """
+    def __init__(self):
+        self.steps = 0
+        self.wall_time = 0.0
+        self.opcodes = Counter()
+        self.opcode_time = defaultdict(float)
+        self.addresses = Counter()
+        self.writes = Counter()
+
+    def record(self, address, opcode, elapsed, target):
+        """
+        Record one executed instruction and the address it wrote to.
+        """
+        self.steps += 1
+        self.opcodes[opcode] += 1
+        self.opcode_time[opcode] += elapsed
+        self.addresses[address] += 1
+        if target is not None:
+            self.writes[target] += 1
+
+    def to_dict(self):
+        return {
+            'steps': self.steps,
+            'wall_time': self.wall_time,
+            'opcodes': {NAMES[opcode]: count for opcode, count in self.opcodes.items()},
+            'opcode_time': {NAMES[opcode]: t for opcode, t in self.opcode_time.items()},
+            'addresses': dict(self.addresses),
+            'writes': dict(self.writes),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def report(self, top=10):
+        """
+        Returns a human readable report with the opcodes and the top
+        hottest addresses.
+        """
+        lines = ["Steps: {}  Wall time: {:.6f}s".format(self.steps, self.wall_time)]
+        lines.append("{:<14}{:>12}{:>14}".format("Opcode", "Count", "Time (s)"))
+        for opcode, count in self.opcodes.most_common():
+            lines.append("{:<14}{:>12}{:>14.6f}".format(
+                NAMES[opcode], count, self.opcode_time[opcode]))
+        lines.append("{:<14}{:>12}".format("Address", "Hits"))
+        for address, count in self.addresses.most_common(top):
+            lines.append("{:<14}{:>12}".format(address, count))
+        lines.append("Memory writes: {}".format(sum(self.writes.values())))
+        return "\n".join(lines)
@@ -1,13 +1,51 @@
+from .image_cache import source_hash
 from .instruction import InstructionFactory
 
 
 class Program:
     """
     A computer program
+
+    The memory factory builds the program memory from the parsed image,
+    e.g. intcode_computer.memory.ArrayMemory for a compact store. A
+    factory with an image method also decides how the pristine image
+    shared by forks is stored. With an ImageCache, see
+    intcode_computer.image_cache, the image is shared by every program
+    built from the same source instead of parsed again.
     """
-    def __init__(self, source_code):
-        self._program = list(map(int, source_code.split(',')))
+    def __init__(self, source_code, memory=list, cache=None):
+        image = getattr(memory, 'image', tuple)
+        if cache is not None:
+            self._image = cache.image(source_code, image)
+        else:
+            self._image = image(map(int, source_code.split(',')))
+        self._load(memory)
+
+    @classmethod
+    def from_values(cls, values, memory=list):
+        """
+        Returns a program whose image is the given integer values.
+        """
+        program = cls.__new__(cls)
+        program._image = getattr(memory, 'image', tuple)(values)
+        program._load(memory)
+        return program
+
+    def _load(self, memory):
+        self._program = memory(self._image)
+        self._dirty = set()
         self._instruction_pointer = 0
+        self._decoded = {}
+        self._digest = None
+
+    def digest(self):
+        """
+        Returns a hash identifying the image of the program, computed
+        once and shared with forks.
+        """
+        if self._digest is None:
+            self._digest = source_hash(",".join(map(str, self._image)))
+        return self._digest
 
     def result(self):
         """
@@ -21,8 +59,39 @@ class Program:
         Restore the first two inputs to the given
         noun and verb.
         """
-        self._program[1] = noun
-        self._program[2] = verb
+        self.update_program(1, noun)
+        self.update_program(2, verb)
+
+    def reset(self):
+        """
+        Reset the program to its initial state. Only the cells
+        written since the last reset are restored.
+        """
+        size = len(self._image)
+        for address in self._dirty:
+            if -size <= address < size:
+                self._program[address] = self._image[address]
+            else:
+                try:
+                    del self._program[address]
+                except IndexError:
+                    pass
+        self._dirty.clear()
+        self._instruction_pointer = 0
+
+    def fork(self):
+        """
+        Returns a copy of the program in its current state that shares
+        the parsed image and decoded instructions with this program.
+        """
+        program = Program.__new__(Program)
+        program._image = self._image
+        program._program = self._program.copy()
+        program._dirty = set(self._dirty)
+        program._instruction_pointer = self._instruction_pointer
+        program._decoded = self._decoded
+        program._digest = self.digest()
+        return program
 
     def execute(self, instruction, input=None):
         """
@@ -36,6 +105,7 @@ class Program:
         Update program at position given by instruction_pointer.
         """
         self._program[intruction_pointer] = value
+        self._dirty.add(intruction_pointer)
 
     def __iter__(self):
         return ProgramIterator(self)
@@ -0,0 +1,79 @@
+from collections import deque
+
+from .channels import input_source, output_sink
+from .engine import HALTED, PREEMPTED, WAITING, DecodedEngine, Machine
+
+
+class Job:
+    """
+    A program run by a Scheduler with its own I/O, the steps it has
+    executed and its status. A job with a budget stops when it has
+    executed max_steps instructions without halting.
+    """
+    def __init__(self, program, inputs=(), outputs=None, max_steps=None):
+        self.program = program
+        self.outputs = []
+        self.machine = Machine(input_source(inputs),
+                               output_sink(outputs if outputs is not None else self.outputs.append))
+        self.max_steps = max_steps
+        self.steps = 0
+        self.status = None
+
+    @property
+    def exceeded(self):
+        """
+        True if the job ran out of its step budget before halting.
+        """
+        return self.status == PREEMPTED and self.remaining == 0
+
+    @property
+    def remaining(self):
+        if self.max_steps is None:
+            return None
+        return self.max_steps - self.steps
+
+
+class Scheduler:
+    """
+    Round-robin scheduler that interleaves the execution of many
+    programs in one process, giving each runnable job at most quantum
+    instructions per turn.
+
+    A job is runnable until it halts, exceeds its step budget or, when
+    no job makes progress in a whole round, waits for input.
+    """
+    def __init__(self, quantum=1000, engine=None):
+        self.quantum = quantum
+        self.engine = engine if engine is not None else DecodedEngine()
+        self.jobs = []
+
+    def add(self, program, inputs=(), outputs=None, max_steps=None):
+        """
+        Add a program reading from the inputs source and writing to the
+        outputs sink, see intcode_computer.channels, or to job.outputs
+        by default. Returns its Job.
+        """
+        job = Job(program, inputs, outputs, max_steps)
+        self.jobs.append(job)
+        return job
+
+    def run(self):
+        """
+        Run the jobs until none is runnable and returns them.
+        """
+        queue = deque(job for job in self.jobs if job.status != HALTED and not job.exceeded)
+        idle = 0
+        while queue and idle < len(queue):
+            job = queue.popleft()
+            quantum = self.quantum
+            if job.max_steps is not None:
+                quantum = min(quantum, job.remaining)
+            job.status = self.engine.execute(job.program, job.machine, quantum)
+            job.steps += job.machine.steps
+
+            if job.status == HALTED or job.exceeded:
+                idle = 0
+                continue
+            idle = idle + 1 if job.status == WAITING and not job.machine.steps else 0
+            queue.append(job)
+        return self.jobs
@@ -0,0 +1,227 @@
+from .engine import DecodedEngine, decode
+
+
+class SymbolicError(Exception):
+    """
+    Raised when the program cannot be executed symbolically, e.g.
+    when control flow or an address depends on the noun or verb.
+    """
+
+
+class Expression:
+    """
+    A polynomial in noun and verb, stored as a mapping of
+    (noun_power, verb_power) to integer coefficients.
+    """
+    def __init__(self, terms):
+        self._terms = {powers: c for powers, c in terms.items() if c != 0}
+
+    @classmethod
+    def constant(cls, value):
+        return cls({(0, 0): value})
+
+    def __add__(self, other):
+        other = _expression(other)
+        terms = dict(self._terms)
+        for powers, coefficient in other._terms.items():
+            terms[powers] = terms.get(powers, 0) + coefficient
+        return Expression(terms)
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        other = _expression(other)
+        terms = {}
+        for (n1, v1), c1 in self._terms.items():
+            for (n2, v2), c2 in other._terms.items():
+                powers = (n1 + n2, v1 + v2)
+                terms[powers] = terms.get(powers, 0) + c1 * c2
+        return Expression(terms)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Expression) and self._terms == other._terms
+
+    def is_constant(self):
+        return all(powers == (0, 0) for powers in self._terms)
+
+    def evaluate(self, noun, verb):
+        """
+        Value of the expression for the given noun and verb.
+        """
+        return sum(c * noun ** n * verb ** v for (n, v), c in self._terms.items())
+
+    def coefficient(self, powers):
+        return self._terms.get(powers, 0)
+
+    def verb_degree(self):
+        return max((v for _, v in self._terms), default=0)
+
+    def __str__(self):
+        terms = []
+        for (n, v), c in sorted(self._terms.items(), reverse=True):
+            factors = [str(c)] if c != 1 or n == v == 0 else []
+            factors += ['noun'] * n + ['verb'] * v
+            terms.append('*'.join(factors))
+        return ' + '.join(terms) or '0'
+
+
+def _expression(value):
+    if isinstance(value, Expression):
+        return value
+    return Expression.constant(value)
+
+
+# Value of a cell read through an address that depends on noun or verb.
+UNKNOWN = object()
+
+
+def _concrete(value):
+    """
+    Returns the value as int, raising SymbolicError when it depends
+    on the noun or verb.
+    """
+    if value is UNKNOWN:
+        raise SymbolicError("Value read from a symbolic address")
+    if isinstance(value, Expression):
+        if not value.is_constant():
+            raise SymbolicError("Value depends on noun or verb")
+        return value.coefficient((0, 0))
+    return value
+
+
+NOUN = Expression({(1, 0): 1})
+VERB = Expression({(0, 1): 1})
+
+
+def symbolic_result(program):
+    """
+    Execute the program from its current state with noun and verb as
+    symbols and returns result() as an Expression. Only arithmetic may
+    depend on the symbols, anything else raises SymbolicError. Cells
+    read through a symbolic address are unknown and may only be used
+    in arithmetic whose result is overwritten before it is needed.
+    """
+    return _symbolic_execute(program)[0]
+
+
+def _symbolic_execute(program):
+    """
+    Returns the result Expression and the list of symbolic addresses
+    that were read, which must be valid addresses for a given noun and
+    verb to run.
+    """
+    memory = list(program._program)
+    memory[1] = NOUN
+    memory[2] = VERB
+    ip = program._instruction_pointer
+    addresses = []
+
+    def read(address, mode):
+        value = memory[address]
+        if mode:
+            return value
+        if isinstance(value, Expression) and not value.is_constant():
+            addresses.append(value)
+            return UNKNOWN
+        return memory[_concrete(value)]
+
+    while True:
+        code, _, mode_1, mode_2, _, size = decode(_concrete(memory[ip]))
+        opcode = code % 100
+
+        if opcode == 99:
+            break
+        elif opcode in (1, 2):
+            a = read(ip + 1, mode_1)
+            b = read(ip + 2, mode_2)
+            target = _concrete(memory[ip + 3])
+            if a is UNKNOWN or b is UNKNOWN:
+                memory[target] = UNKNOWN
+            elif opcode == 1:
+                memory[target] = _expression(a) + b
+            else:
+                memory[target] = _expression(a) * b
+            ip += size
+        elif opcode in (5, 6):
+            a = _concrete(read(ip + 1, mode_1))
+            if (a != 0) == (opcode == 5):
+                ip = _concrete(read(ip + 2, mode_2))
+            else:
+                ip += size
+        elif opcode in (7, 8):
+            a = _concrete(read(ip + 1, mode_1))
+            b = _concrete(read(ip + 2, mode_2))
+            target = _concrete(memory[ip + 3])
+            memory[target] = int(a < b if opcode == 7 else a == b)
+            ip += size
+        else:
+            raise SymbolicError("Input and output are not supported")
+
+    if memory[0] is UNKNOWN:
+        raise SymbolicError("Result read from a symbolic address")
+    return _expression(memory[0]), addresses
+
+
+def _solutions(expression, target, nouns, verbs):
+    """
+    Yields the (noun, verb) pairs for which expression equals target.
+    """
+    verbs = list(verbs)
+    if expression.verb_degree() > 1:
+        for noun in nouns:
+            for verb in verbs:
+                if expression.evaluate(noun, verb) == target:
+                    yield noun, verb
+        return
+
+    # Linear in verb: result = slope(noun) * verb + offset(noun)
+    valid_verbs = set(verbs)
+    for noun in nouns:
+        offset = expression.evaluate(noun, 0)
+        slope = expression.evaluate(noun, 1) - offset
+        if slope == 0:
+            if offset == target:
+                for verb in verbs:
+                    yield noun, verb
+            continue
+        verb, remainder = divmod(target - offset, slope)
+        if remainder == 0 and verb in valid_verbs:
+            yield noun, verb
+
+
+def solve(program, target, nouns=range(100), verbs=range(100)):
+    """
+    Returns the first (noun, verb) for which the restored program
+    computes target, or None. The closed form of result() is solved
+    directly, falling back to running the program for every pair
+    when the program cannot be executed symbolically. Pairs for which
+    the program reads outside of its memory are skipped.
+    """
+    try:
+        expression, addresses = _symbolic_execute(program)
+    except SymbolicError:
+        expression = None
+
+    if expression is not None:
+        size = len(program._program)
+        for noun, verb in _solutions(expression, target, nouns, verbs):
+            if all(0 <= address.evaluate(noun, verb) < size for address in addresses):
+                return noun, verb
+        return None
+
+    # Outputs of the program are discarded during the search.
+    engine = DecodedEngine(lambda value: None)
+    candidate = program.fork()
+    verbs = list(verbs)
+    for noun in nouns:
+        for verb in verbs:
+            candidate.reset()
+            candidate.restore(noun, verb)
+            try:
+                if engine.run(candidate) == target:
+                    return noun, verb
+            except (IndexError, ValueError):
+                continue
+    return None
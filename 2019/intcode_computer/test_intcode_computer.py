@@ -1,9 +1,52 @@
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import tracemalloc
 import unittest
+from queue import Queue
 from io import StringIO
 from unittest.mock import patch
 from .computer import Computer
 from .program import Program
 from .instruction import get_modes
+from .engine import (
+    HALTED, PREEMPTED, WAITING, DecodedEngine, Machine, StepLimitExceeded, WaitingForInput)
+from .channels import input_source, output_sink
+from .compiler import CompiledEngine
+from .memory import ArrayMemory
+from .network import Deadlock, Network
+from .profiler import Profiler
+from .trace import Trace
+from .fusion import ControlFlowGraph, FusedEngine, fuse
+from .scheduler import Scheduler
+from .image_cache import ImageCache, source_hash
+from .memo import Memo
+from .checkpoint import Checkpoint, Checkpointer
+from .disassembler import disassemble
+from .optimizer import optimize
+from . import benchmark
+
+try:
+    import numpy
+    from .batch import BatchEngine
+except ImportError:
+    numpy = None
+from .symbolic import SymbolicError, solve, symbolic_result
+
+
+class TaggedEngine(DecodedEngine):
+    """
+    Engine that writes a tag before executing, to tell it apart in sweeps.
+    """
+    def __init__(self, tag='tagged'):
+        super().__init__()
+        self.tag = tag
+
+    def execute(self, program, machine, max_steps=None):
+        machine.output(self.tag)
+        return super().execute(program, machine, max_steps)
 
 
 class Test(unittest.TestCase):
@@ -103,3 +146,708 @@ class Test(unittest.TestCase):
             Computer(program).run(diagnostic_id=0)
             self.assertEqual("Diagnostic code:  0\n", mock_stdout.getvalue())
 
+
+    def test_decoded_engine(self):
+        engine = DecodedEngine()
+        self.assertEqual(Computer(Program('1,9,10,3,2,3,11,0,99,30,40,50'), engine).run(), 3500)
+        self.assertEqual(Computer(Program('3,0,4,0,99'), engine).run(diagnostic_id=123), 123)
+
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            program = Program("3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9")
+            Computer(program, engine).run(diagnostic_id=4)
+            self.assertEqual("Diagnostic code:  1\n", mock_stdout.getvalue())
+
+    def test_decoded_engine_self_modifying(self):
+        # The first instruction overwrites the opcode at address 4 with 99.
+        program = Program('1101,90,9,4,1,0,0,0,99')
+        self.assertEqual(Computer(program, DecodedEngine()).run(), 1101)
+        self.assertEqual(str(program), '1101,90,9,4,99,0,0,0,99')
+
+        # A decoded address that is later overwritten is decoded again.
+        program = Program('1101,2,3,5,99,0')
+        engine = DecodedEngine()
+        engine.run(program)
+        self.assertEqual(str(program), '1101,2,3,5,99,5')
+        program.update_program(0, 1102)
+        program._instruction_pointer = 0
+        self.assertEqual(engine.run(program), 1102)
+        self.assertEqual(str(program), '1102,2,3,5,99,6')
+
+    def test_reset_and_fork(self):
+        program = Program('1,9,10,3,2,3,11,0,99,30,40,50')
+        self.assertEqual(Computer(program).run(), 3500)
+        self.assertEqual(program._dirty, {0, 3})
+
+        program.reset()
+        self.assertEqual(str(program), '1,9,10,3,2,3,11,0,99,30,40,50')
+        self.assertEqual(program.instruction_pointer, 0)
+
+        program.restore(9, 11)
+        fork = program.fork()
+        self.assertEqual(Computer(fork, DecodedEngine()).run(), 4000)
+        self.assertEqual(str(program), '1,9,11,3,2,3,11,0,99,30,40,50')
+
+        fork.reset()
+        self.assertEqual(str(fork), '1,9,10,3,2,3,11,0,99,30,40,50')
+
+    def test_sweep(self):
+        computer = Computer(Program('1,0,0,0,99'))
+        cases = [((noun, verb), None) for noun in range(5) for verb in range(5)]
+        results = list(computer.sweep(cases, processes=2, chunksize=4))
+        self.assertEqual([case for case, _, _ in results], cases)
+        self.assertEqual(results[7][1], 1 + 2)
+
+        computer = Computer(Program('3,0,4,0,99'))
+        results = list(computer.sweep([(None, 7), (None, 0)], processes=2))
+        self.assertEqual(results, [((None, 7), 7, [7]), ((None, 0), 0, [0])])
+
+    def test_search(self):
+        computer = Computer(Program('1,0,0,0,99'))
+        cases = (((noun, verb), None) for noun in range(5) for verb in range(5))
+        self.assertEqual(computer.search(cases, 99 + 99, processes=2), (((4, 4), None), 198, []))
+        self.assertIsNone(computer.search([((0, 0), None)], 3, processes=1))
+
+    def test_sweep_engine(self):
+        computer = Computer(Program('3,0,4,0,99'), TaggedEngine())
+        results = list(computer.sweep([(None, 7)], processes=1))
+        self.assertEqual(results, [((None, 7), 7, ['tagged', 7])])
+
+        # Workers use the configured engine, not a default one.
+        computer = Computer(Program('3,0,4,0,99'), TaggedEngine('custom'))
+        results = list(computer.sweep([(None, 7)], processes=1))
+        self.assertEqual(results, [((None, 7), 7, ['custom', 7])])
+
+        for engine in [CompiledEngine(), FusedEngine()]:
+            computer = Computer(Program('1,0,0,0,99'), engine)
+            computer.run()
+            results = list(computer.sweep([((1, 2), None)], processes=1))
+            self.assertEqual(results, [(((1, 2), None), 3, [])])
+
+    def test_search_stops_enumeration(self):
+        consumed = []
+
+        def cases():
+            for noun in itertools.count():
+                consumed.append(noun)
+                yield (noun % 5, 0), None
+
+        computer = Computer(Program('1,0,0,0,99'))
+        match = computer.search(cases(), 99 + 1, processes=2, chunksize=4)
+        self.assertEqual(match, (((4, 0), None), 100, []))
+        self.assertLessEqual(len(consumed), 2 * 4)
+
+    def test_symbolic_result(self):
+        expression = symbolic_result(Program('1101,0,0,0,1002,0,3,0,99'))
+        self.assertEqual(str(expression), '3*noun + 3*verb')
+        self.assertEqual(expression.evaluate(4, 5), 27)
+
+        # Cells read through the noun and verb as addresses are overwritten.
+        expression = symbolic_result(Program('1,0,0,3,1,1,2,3,2,3,13,0,99,99'))
+        self.assertEqual(str(expression), '99*noun + 99*verb')
+
+        with self.assertRaises(SymbolicError):
+            symbolic_result(Program('1101,0,0,0,1008,0,10,0,99'))
+
+    def test_solve(self):
+        self.assertEqual(solve(Program('1101,0,0,0,1002,0,3,0,99'), 30), (0, 10))
+        self.assertEqual(solve(Program('1102,0,0,0,99'), 12, verbs=range(3, 5)), (3, 4))
+        self.assertIsNone(solve(Program('1102,0,0,0,99'), 7, nouns=range(2, 3)))
+
+        # Control flow depends on the symbols so the pairs are run concretely.
+        self.assertEqual(solve(Program('1101,0,0,0,1008,0,10,0,99'), 1), (0, 10))
+
+    def test_solve_address_range(self):
+        # Noun and verb are read as addresses, so both must be below 14.
+        program = Program('1,0,0,3,1,1,2,3,2,3,13,0,99,99')
+        self.assertEqual(solve(program, 1980), (7, 13))
+
+        program.restore(7, 13)
+        self.assertEqual(Computer(program).run(), 1980)
+
+    def test_solve_fallback_discards_outputs(self):
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            program = Program('1101,0,0,0,1008,0,10,0,4,0,99')
+            self.assertEqual(solve(program, 1), (0, 10))
+            self.assertEqual(mock_stdout.getvalue(), '')
+
+    def test_compiled_engine(self):
+        engine = CompiledEngine()
+        self.assertEqual(Computer(Program('1,9,10,3,2,3,11,0,99,30,40,50'), engine).run(), 3500)
+        self.assertEqual(Computer(Program('3,0,4,0,99'), engine).run(diagnostic_id=123), 123)
+
+        for diagnostic_id, expected in [(0, 0), (4, 1)]:
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                program = Program("3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9")
+                Computer(program, engine).run(diagnostic_id=diagnostic_id)
+                self.assertEqual("Diagnostic code:  {}\n".format(expected), mock_stdout.getvalue())
+
+    def test_compiled_engine_halts_in_block(self):
+        engine = CompiledEngine()
+        program = Program('1001,16,3,16,1001,17,-1,17,1005,17,0,4,16,99,0,0,0,5')
+        self.assertEqual(engine.execute(program, Machine(lambda: None, list().append)), HALTED)
+        self.assertEqual(program.instruction_pointer, 13)
+        # The halt is part of the compiled program, nothing is compiled at 99.
+        self.assertEqual(list(engine._cache), [0])
+
+    def assertSameAsDecoded(self, source, input=None, engine_type=CompiledEngine):
+        decoded_outputs, compiled_outputs = [], []
+        decoded, compiled = Program(source), Program(source)
+        DecodedEngine(decoded_outputs.append).run(decoded, input)
+        engine_type(compiled_outputs.append).run(compiled, input)
+        self.assertEqual(str(compiled), str(decoded))
+        self.assertEqual(compiled_outputs, decoded_outputs)
+        self.assertEqual(compiled.result(), decoded.result())
+        self.assertEqual(compiled.instruction_pointer, decoded.instruction_pointer)
+
+    def test_compiled_engine_self_modifying(self):
+        # The first instruction overwrites the opcode at address 4 with 99.
+        program = Program('1101,90,9,4,1,0,0,0,99')
+        self.assertEqual(Computer(program, CompiledEngine()).run(), 1101)
+        self.assertEqual(str(program), '1101,90,9,4,99,0,0,0,99')
+        self.assertSameAsDecoded('1101,90,9,4,1,0,0,0,99')
+
+        # The input lands in the operand of the jump at address 2.
+        for diagnostic_id in [0, 1]:
+            self.assertSameAsDecoded("3,3,1105,-1,9,1101,0,0,12,4,12,99,1", diagnostic_id)
+
+        # The first instruction rewrites the add in the loop body into a multiply.
+        self.assertSameAsDecoded('1101,0,2,4,1,20,21,20,1001,22,-1,22,1005,22,4,4,20,99,0,0,1,3,3')
+
+        # Loop counting down from 5 while accumulating into address 16.
+        source = '1001,16,3,16,1001,17,-1,17,1005,17,0,4,16,99,0,0,0,5'
+        outputs = []
+        program = Program(source)
+        CompiledEngine(outputs.append).run(program)
+        self.assertEqual(outputs, [15])
+        self.assertEqual(program._dirty, {16, 17})
+        self.assertSameAsDecoded(source)
+
+    def test_array_memory(self):
+        memory = ArrayMemory([1, 2, 3])
+        self.assertEqual(memory[1], 2)
+        self.assertEqual(memory[0:2], [1, 2])
+        self.assertEqual(memory[1000], 0)
+
+        memory[1000] = 7
+        self.assertEqual(memory[1000], 7)
+        self.assertEqual(len(memory), 3)
+        del memory[1000]
+        self.assertEqual(memory[1000], 0)
+
+        with self.assertRaises(IndexError):
+            memory[-1]
+        with self.assertRaises(IndexError):
+            memory[-1] = 0
+        with self.assertRaises(IndexError):
+            memory[-1:]
+        with self.assertRaises(IndexError):
+            memory[0:-1]
+
+        copy = memory.copy()
+        memory[2] = 2 ** 70
+        self.assertTrue(memory.promoted)
+        self.assertEqual(list(memory), [1, 2, 2 ** 70])
+        self.assertFalse(copy.promoted)
+        self.assertEqual(list(copy), [1, 2, 3])
+
+    def test_array_memory_footprint(self):
+        source = ','.join(str(1000 + i) for i in range(100000))
+
+        def footprint(memory):
+            tracemalloc.start()
+            try:
+                program = Program(source, memory)
+                forks = [program.fork() for _ in range(20)]
+                for fork in forks:
+                    fork.update_program(0, 1)
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        # The image takes 8 bytes a cell and forks only copy written pages.
+        self.assertLess(footprint(ArrayMemory), footprint(list) / 10)
+        self.assertLess(footprint(ArrayMemory), 100000 * 8 * 2)
+
+    def test_array_memory_program(self):
+        for engine in [None, DecodedEngine(), CompiledEngine()]:
+            program = Program('1,9,10,3,2,3,11,0,99,30,40,50', ArrayMemory)
+            self.assertEqual(Computer(program, engine).run(), 3500)
+
+        # Write past the image and reset it again.
+        program = Program('1101,3,4,100,4,100,99', ArrayMemory)
+        outputs = []
+        DecodedEngine(outputs.append).run(program)
+        self.assertEqual(outputs, [7])
+        fork = program.fork()
+        program.reset()
+        self.assertEqual(program._program[100], 0)
+        self.assertEqual(fork._program[100], 7)
+
+        program = Program('1102,4294967296,4294967296,0,99', ArrayMemory)
+        self.assertEqual(Computer(program, DecodedEngine()).run(), 2 ** 64)
+
+    def test_outputs(self):
+        # Echo every input doubled until the input is 0.
+        source = '3,15,1006,15,14,1002,15,2,16,4,16,1105,1,0,99,0,0'
+        for engine in [None, DecodedEngine(), CompiledEngine()]:
+            computer = Computer(Program(source), engine)
+            outputs = computer.outputs(iter([1, 2, 3, 0]))
+            self.assertEqual(next(outputs), 2)
+            self.assertEqual(list(outputs), [4, 6])
+
+            # The program waits once the inputs run out and can be resumed.
+            computer = Computer(Program(source), engine)
+            self.assertEqual(list(computer.outputs([5])), [10])
+            self.assertEqual(list(computer.outputs([6, 0])), [12])
+
+    def test_execute_channels(self):
+        source = '3,15,1006,15,14,1002,15,2,16,4,16,1105,1,0,99,0,0'
+
+        inputs = Queue()
+        outputs = []
+        computer = Computer(Program(source), CompiledEngine())
+        inputs.put(7)
+        self.assertEqual(computer.execute(inputs, outputs), WAITING)
+        inputs.put(0)
+        self.assertEqual(computer.execute(inputs, outputs), HALTED)
+        self.assertEqual(outputs, [14])
+
+        def collect(received):
+            while True:
+                received.append((yield))
+
+        received = []
+        computer = Computer(Program(source))
+        values = iter([1, 2, 0])
+        self.assertEqual(computer.execute(lambda: next(values), collect(received)), HALTED)
+        self.assertEqual(received, [2, 4])
+
+    def test_input_source(self):
+        queue = asyncio.Queue()
+        read = input_source(queue)
+        with self.assertRaises(WaitingForInput):
+            read()
+        queue.put_nowait(3)
+        self.assertEqual(read(), 3)
+
+        with self.assertRaises(TypeError):
+            input_source('123')
+        with self.assertRaises(TypeError):
+            input_source(b'123')
+
+        read = input_source(5)
+        self.assertEqual((read(), read()), (5, 5))
+
+    def test_output_sink(self):
+        queue = asyncio.Queue()
+        write = output_sink(queue)
+        write(4)
+        write(2)
+        self.assertEqual((queue.get_nowait(), queue.get_nowait()), (4, 2))
+
+    def test_network_feedback_loop(self):
+        source = ('3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,'
+                  '27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5')
+        for engine in [DecodedEngine(), CompiledEngine()]:
+            network = Network()
+            amplifiers = [network.add(Program(source), engine) for _ in range(5)]
+            for amplifier, phase in zip(amplifiers, [9, 8, 7, 6, 5]):
+                amplifier.send(phase)
+            for source_amplifier, target in zip(amplifiers, amplifiers[1:] + amplifiers[:1]):
+                network.connect(source_amplifier, target)
+            amplifiers[0].send(0)
+
+            network.run()
+            self.assertEqual(amplifiers[-1].outputs[-1], 139629729)
+
+    def test_network_fan_out(self):
+        network = Network()
+        doubler = network.add(Program('3,9,1002,9,2,9,4,9,99,0'))
+        echoes = [network.add(Program('3,0,4,0,99')) for _ in range(3)]
+        for echo in echoes:
+            network.connect(doubler, echo)
+        doubler.send(21)
+
+        self.assertEqual(network.run(), [3, 42, 42, 42])
+        self.assertEqual([echo.outputs for echo in echoes], [[42], [42], [42]])
+
+    def test_network_deadlock(self):
+        network = Network()
+        first = network.add(Program('3,0,4,0,99'))
+        second = network.add(Program('3,0,4,0,99'))
+        network.connect(first, second)
+        network.connect(second, first)
+        with self.assertRaises(Deadlock):
+            network.run()
+
+    def test_network_producer_halts(self):
+        network = Network()
+        consumer = network.add(Program('3,0,4,0,99'))
+        producer = network.add(Program('1101,1,1,0,99'))
+        network.connect(producer, consumer)
+        with self.assertRaises(Deadlock):
+            network.run()
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_engine(self):
+        source = '1,9,10,3,2,3,11,0,99,30,40,50'
+        pairs = [(noun, verb) for noun in range(12) for verb in range(12)]
+        results, outputs = BatchEngine().run(Program(source), restores=pairs)
+        for (noun, verb), result in zip(pairs, results.tolist()):
+            program = Program(source)
+            program.restore(noun, verb)
+            self.assertEqual(result, Computer(program, DecodedEngine()).run())
+        self.assertEqual(outputs, [[] for _ in pairs])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_engine_divergent_lanes(self):
+        # Lanes jump to different addresses depending on their input.
+        source = "3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9"
+        _, outputs = BatchEngine().run(Program(source), inputs=[0, 4, 0, -2])
+        self.assertEqual(outputs, [[0], [1], [0], [1]])
+
+        # Count down loops of different lengths from the input.
+        source = '3,19,1001,18,3,18,1001,19,-1,19,1005,19,2,4,18,99,0,0,0,0'
+        _, outputs = BatchEngine().run(Program(source), inputs=[1, 5, 3])
+        self.assertEqual(outputs, [[3], [15], [9]])
+
+    def test_profiler(self):
+        profiler = Profiler()
+        source = '1001,16,3,16,1001,17,-1,17,1005,17,0,4,16,99,0,0,0,5'
+        with patch('sys.stdout', new_callable=StringIO):
+            Computer(Program(source), profiler=profiler).run()
+
+        self.assertEqual(profiler.steps, 5 * 3 + 1)
+        self.assertEqual(profiler.opcodes, {1: 10, 5: 5, 4: 1})
+        self.assertEqual(profiler.addresses[0], 5)
+        self.assertEqual(profiler.writes, {16: 5, 17: 5})
+
+        stats = json.loads(profiler.to_json())
+        self.assertEqual(stats['opcodes'], {'add': 10, 'jump-if-true': 5, 'output': 1})
+        self.assertIn("jump-if-true", profiler.report())
+
+        with self.assertRaises(ValueError):
+            Computer(Program(source), DecodedEngine(), profiler)
+
+        # The profiled loop honours paused outputs like the plain loop.
+        profiler = Profiler()
+        outputs = Computer(Program('3,0,4,0,4,0,99'), profiler=profiler).outputs([6])
+        self.assertEqual(list(outputs), [6, 6])
+        self.assertEqual(profiler.opcodes, {3: 1, 4: 2})
+
+    def test_trace(self):
+        source = '1001,16,3,16,1001,17,-1,17,1005,17,0,4,16,99,0,0,0,5'
+        trace = Trace(size=8)
+        program = Program(source)
+        with patch('sys.stdout', new_callable=StringIO):
+            Computer(program, trace=trace).run()
+
+        self.assertEqual(trace.count, 16)
+        self.assertEqual(len(trace.steps), 8)
+        last = trace.steps[-1]
+        self.assertEqual((last.index, last.ip, last.code, last.output), (15, 11, 4, 15))
+        self.assertEqual(trace.steps[-2].write, None)
+        self.assertEqual(trace.steps[-3].write, (17, 1, 0))
+
+        replay = trace.replay(program)
+        replay.seek(8)
+        self.assertEqual((replay.ip, replay.memory[16], replay.memory[17]), (8, 9, 2))
+
+        # Compare with a run of the same program stopped after 8 steps.
+        expected = Program(source)
+        steps = iter(range(8))
+        for instruction in expected:
+            if next(steps, None) is None:
+                break
+            expected.execute(instruction)
+        self.assertEqual(list(replay.memory), list(expected._program))
+        self.assertEqual(replay.ip, expected.instruction_pointer)
+
+        replay.seek(16)
+        self.assertEqual(list(replay.memory), list(program._program))
+        self.assertEqual(replay.ip, 13)
+        replay.seek(13)
+        self.assertEqual((replay.ip, replay.memory[16]), (4, 15))
+
+        with self.assertRaises(IndexError):
+            replay.seek(7)
+
+    def test_trace_io(self):
+        trace = Trace()
+        Computer(Program('3,0,4,0,99'), trace=trace).execute([42], list())
+        self.assertEqual(trace.steps[0].write, (0, 3, 42))
+        self.assertEqual(trace.steps[1].output, 42)
+
+    def test_control_flow_graph(self):
+        program = Program("3,3,1105,-1,9,1101,0,0,12,4,12,99,1")
+        graph = ControlFlowGraph(program._program)
+        self.assertEqual(sorted(graph.blocks), [0, 5, 9])
+        self.assertEqual(graph.blocks[0].successors, [5, 9])
+        self.assertEqual(graph.blocks[0].end, 5)
+        self.assertEqual(graph.blocks[5].successors, [9])
+        self.assertEqual([ip for ip, _ in graph.blocks[9].instructions], [9, 11])
+
+    def test_fused_engine(self):
+        source = '1001,16,3,16,1001,17,-1,17,1005,17,0,4,16,99,0,0,0,5'
+        entries = fuse(ControlFlowGraph(Program(source)._program))
+        self.assertEqual(list(entries), [0])
+        self.assertEqual(entries[0][5], 11)
+        self.assertEqual(entries[0][6], (1001, 1001, 1005))
+        self.assertSameAsDecoded(source, engine_type=FusedEngine)
+
+        # Compare then jump on the comparison result.
+        for diagnostic_id in [3, 8, 9]:
+            self.assertSameAsDecoded('3,20,1007,20,8,21,1005,21,14,104,0,1105,1,16,104,1,99,0,0,0,0,0',
+                                     diagnostic_id, FusedEngine)
+        entries = fuse(ControlFlowGraph(Program('3,20,1007,20,8,21,1005,21,13,104,0')._program))
+        self.assertEqual(list(entries), [2])
+
+    def test_fused_engine_self_modifying(self):
+        # The first add of the fused run rewrites the second into a multiply.
+        source = '1101,0,2,4,1,12,13,12,4,12,99,0,5,7'
+        outputs = []
+        engine = FusedEngine(outputs.append)
+        program = Program(source)
+        self.assertEqual(engine._table(program)[0][1].__name__, 'fused')
+        engine.run(program)
+        self.assertEqual(engine._table(program)[0][1].__name__, '_add')
+        self.assertEqual(outputs, [35])
+        self.assertSameAsDecoded(source, engine_type=FusedEngine)
+
+    def test_benchmark_workloads(self):
+        workloads = [
+            (benchmark.arithmetic_loop(10), None, [55]),
+            (benchmark.branch_heavy(5), None, [2, 3]),
+            (benchmark.io_heavy(3), [1, 2, 3], [2, 4, 6]),
+            (benchmark.self_modifying(5), None, [2]),
+            (benchmark.large_image(100, 4), None, [10]),
+        ]
+        for source, inputs, expected in workloads:
+            for engine_type in benchmark.ENGINES.values():
+                self.assertEqual(benchmark._execute(engine_type, Program(source), inputs), expected)
+
+    def test_benchmark_compare(self):
+        results = benchmark.run({'arithmetic': lambda scale: (benchmark.arithmetic_loop(10), None)},
+                                {'decoded': DecodedEngine, 'fused': FusedEngine}, repeat=1)
+        result = results['arithmetic']['fused']
+        self.assertEqual(result['steps'], 41)
+        self.assertEqual(results['arithmetic']['decoded']['relative'], 1.0)
+        self.assertEqual(benchmark.compare(results, results), [])
+
+        faster = dict(result, relative=result['relative'] * 2)
+        smaller = dict(result, peak_memory=result['peak_memory'] // 2)
+        regressions = benchmark.compare(results, {'arithmetic': {'fused': faster}})
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('decoded', regressions[0])
+        regressions = benchmark.compare(results, {'arithmetic': {'fused': smaller}})
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('peak memory', regressions[0])
+
+    def test_max_steps(self):
+        computer = Computer(Program('1105,1,0,99'))
+        with self.assertRaises(StepLimitExceeded):
+            computer.run(max_steps=100)
+        self.assertEqual(computer.step(3), PREEMPTED)
+
+        for engine in [None, DecodedEngine(), CompiledEngine(), FusedEngine()]:
+            outputs = []
+            computer = Computer(Program(benchmark.arithmetic_loop(10)), engine)
+            self.assertEqual(computer.step(5, outputs=outputs.append), PREEMPTED)
+            self.assertEqual(computer.step(36, outputs=outputs.append), PREEMPTED)
+            self.assertEqual(outputs, [55])
+            self.assertEqual(computer.step(1, outputs=outputs.append), HALTED)
+
+        machine = Machine(input_source([]), list().append)
+        program = Program('1,0,0,0,3,0,99')
+        self.assertEqual(DecodedEngine().execute(program, machine, 10), WAITING)
+        self.assertEqual((machine.steps, program.instruction_pointer), (1, 4))
+
+    def test_scheduler(self):
+        scheduler = Scheduler(quantum=7)
+        runaway = scheduler.add(Program('1105,1,0'), max_steps=500)
+        loops = [scheduler.add(Program(benchmark.arithmetic_loop(n))) for n in [10, 100]]
+
+        # The consumer waits on a queue until the producer writes to it.
+        queue = Queue()
+        consumer = scheduler.add(Program(benchmark.io_heavy(3)), inputs=queue)
+        producer = scheduler.add(Program('4,7,4,8,4,9,99,1,2,3'), outputs=queue)
+        blocked = scheduler.add(Program('3,0,99'))
+
+        scheduler.run()
+        self.assertTrue(runaway.exceeded)
+        self.assertEqual(runaway.steps, 500)
+        self.assertEqual([loop.outputs for loop in loops], [[55], [5050]])
+        self.assertEqual([loop.status for loop in loops], [HALTED, HALTED])
+        self.assertEqual(consumer.outputs, [2, 4, 6])
+        self.assertEqual(producer.status, HALTED)
+        self.assertEqual(blocked.status, WAITING)
+        self.assertFalse(blocked.exceeded)
+
+    def test_image_cache(self):
+        cache = ImageCache(size=2)
+        first = Program('1,0,0,0,99', cache=cache)
+        second = Program('1,0,0,0,99', cache=cache)
+        self.assertIs(first._image, second._image)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # Programs built from a cached image have their own memory.
+        Computer(first, DecodedEngine()).run()
+        self.assertEqual(str(first), '2,0,0,0,99')
+        self.assertEqual(str(second), '1,0,0,0,99')
+
+        array_program = Program('1,0,0,0,99', ArrayMemory, cache=cache)
+        self.assertIsInstance(array_program._image, ArrayMemory)
+        Program('2,0,0,0,99', cache=cache)
+        Program('1,0,0,0,99', cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+    def test_image_cache_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = '1,0,0,0,99,' + str(2 ** 62)
+            Program(source, cache=ImageCache(directory=directory))
+            self.assertTrue(os.path.exists(os.path.join(directory, source_hash(source) + '.bin')))
+
+            # Sources are only stored after they were parsed.
+            with patch.object(ImageCache, '_store') as store:
+                program = Program(source, cache=ImageCache(directory=directory))
+            store.assert_not_called()
+            self.assertEqual(str(program), source)
+
+            # ArrayMemory pages are served from the mapped file and only
+            # copied when written.
+            cache = ImageCache(directory=directory)
+            first = Program(source, ArrayMemory, cache=cache)
+            self.assertIsInstance(first._image._pages[0], memoryview)
+            second = first.fork()
+            Computer(first, DecodedEngine()).run()
+            self.assertEqual(str(first), '2,0,0,0,99,' + str(2 ** 62))
+            self.assertEqual(str(second), source)
+            self.assertIsInstance(second._program._pages[0], memoryview)
+            first.reset()
+            self.assertEqual(str(first), source)
+
+            # Values beyond 64 bits are kept in memory only.
+            big = '1,0,0,0,99,' + str(2 ** 64)
+            self.assertEqual(str(Program(big, cache=ImageCache(directory=directory))), big)
+            self.assertFalse(os.path.exists(os.path.join(directory, source_hash(big) + '.bin')))
+
+    def test_memo(self):
+        memo = Memo(size=2)
+        program = Program('1,0,0,0,99')
+        computer = Computer(program, memo=memo)
+        results = []
+        for noun, verb in [(1, 2), (3, 4), (1, 2)]:
+            program.reset()
+            program.restore(noun, verb)
+            results.append(computer.run())
+        self.assertEqual(results, [3, 99, 3])
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (1, 2, 2))
+        self.assertEqual(str(program), '3,1,2,0,99')
+
+        # Programs with the same image share entries, other inputs miss.
+        outputs = []
+        source = '3,9,8,9,10,9,4,9,99,-1,8'
+        for diagnostic_id in [8, 8, 7]:
+            Computer(Program(source), DecodedEngine(outputs.append), memo=memo).run(diagnostic_id)
+        self.assertEqual(outputs, [1, 1, 0])
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (2, 4, 2))
+
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            Computer(Program(source), memo=memo).run(8)
+        self.assertEqual(stdout.getvalue(), "Diagnostic code:  1\n")
+
+    def test_checkpoint(self):
+        program = Program('1,0,0,0,99,' + str(2 ** 70), ArrayMemory)
+        program.update_program(5000, -7)
+        Computer(program, DecodedEngine()).run()
+        checkpoint = Checkpoint.from_bytes(
+            Checkpoint(program, 4, [1, 2], [-3]).to_bytes(), ArrayMemory)
+        self.assertEqual(str(checkpoint.program), str(program))
+        self.assertEqual(checkpoint.program._program[5000], -7)
+        self.assertEqual(checkpoint.program.instruction_pointer, 4)
+        self.assertEqual((checkpoint.steps, checkpoint.inputs, checkpoint.outputs), (4, [1, 2], [-3]))
+        with self.assertRaises(ValueError):
+            Checkpoint.from_bytes(b'x' * 64)
+
+    def test_checkpointer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.ckpt')
+            computer = Computer(Program(benchmark.io_heavy(1000)), DecodedEngine(list().append),
+                                checkpointer=Checkpointer(path, every=1000))
+            with self.assertRaises(StepLimitExceeded):
+                computer.run(3, max_steps=2500)
+            self.assertEqual(Checkpoint.load(path).steps, 2500)
+
+            # Every program loaded from the checkpoint continues the run.
+            for _ in range(2):
+                outputs = []
+                checkpoint = Checkpoint.load(path)
+                Computer(checkpoint.program, DecodedEngine(outputs.append)).run(*checkpoint.inputs)
+                self.assertEqual(outputs, [6] * 500)
+
+            outputs = []
+            checkpointer = Checkpointer(path, every=1000)
+            Computer.resume(checkpointer, DecodedEngine(outputs.append)).run()
+            self.assertEqual(outputs, [6] * 500)
+            self.assertEqual(len(checkpointer.outputs), 1000)
+            self.assertEqual(checkpointer.steps, 5000)
+            self.assertEqual(Checkpoint.load(path).steps, 4500)
+
+            # Checkpointed runs are executed even when the memo has them.
+            memo = Memo()
+            Computer(Program('1,0,0,0,99'), memo=memo).run()
+            computer = Computer(Program('1,0,0,0,99'), memo=memo,
+                                checkpointer=Checkpointer(path, every=1))
+            with self.assertRaises(StepLimitExceeded):
+                computer.run(max_steps=1)
+            self.assertEqual(Checkpoint.load(path).steps, 1)
+
+        with self.assertRaises(ValueError):
+            Checkpointer('run.ckpt', every=0)
+
+    def test_disassemble(self):
+        self.assertEqual(disassemble(Program('1002,7,3,7,1105,1,9,33,0,99')), [
+            "     0: multiply      [7], 3 -> [7]",
+            "     4: jump-if-true  1, 9",
+            "     7: data          33",
+            "     8: data          0",
+            "     9: halt",
+        ])
+        self.assertEqual(disassemble(Program('3,5,4,5,99,0'))[1:], [
+            "     2: output        [5]",
+            "     4: halt",
+            "     5: data          0",
+        ])
+
+    def test_optimize(self):
+        # Constant jumps, a redundant and a dead store around an input loop.
+        source = ('1101,0,0,50,1005,51,10,4,52,99,1006,51,9,1101,2,3,53,1,53,54,55,3,56,'
+                  '1,50,56,50,1001,57,-1,57,1005,57,21,4,50,2,53,58,59,4,59,99,'
+                  '0,0,0,0,0,0,0,0,1,77,5,9,0,0,3,7,0')
+        optimized = optimize(Program(source))
+        self.assertEqual(str(optimized), '1101,0,0,26,3,27,1,26,27,26,1001,28,-1,28,1005,28,4,'
+                                         '4,26,1101,35,0,29,4,29,99,0,0,3,0')
+
+        sources = [source, benchmark.arithmetic_loop(7), benchmark.branch_heavy(5),
+                   benchmark.io_heavy(3), benchmark.self_modifying(5),
+                   '1,9,10,3,2,3,11,0,99,30,40,50', '3,9,8,9,10,9,4,9,99,-1,8',
+                   '3,3,1107,-1,8,3,4,3,99',
+                   # A jump at address 0 that is never taken.
+                   '1106,1,10,1105,2,16,8,17,0,0,1005,22,16,1105,1,6,99,0,2,1,-2,4,5',
+                   # An indirect jump through a cell holding an address past the memory.
+                   '6,0,6,99,1008,20,13,2,99,101,8,8,27,101,5,7,28,1005,4,7,1006,2,10,1102,23,16,13,99,2,2']
+        # Differential test against the original interpreter.
+        for source in sources:
+            images = [source, str(optimize(Program(source)))]
+            for diagnostic_id in [7, 8]:
+                runs = []
+                for image in images:
+                    with patch('sys.stdout', new_callable=StringIO) as stdout:
+                        result = Computer(Program(image)).run(diagnostic_id)
+                    profiler = Profiler()
+                    Computer(Program(image), profiler=profiler).execute(diagnostic_id, list().append)
+                    runs.append((result, stdout.getvalue(), profiler.steps))
+                self.assertEqual(runs[1][:2], runs[0][:2])
+                self.assertLessEqual(runs[1][2], runs[0][2])
+                if source is sources[0]:
+                    self.assertLess(runs[1][2], runs[0][2])
@@ -0,0 +1,76 @@
+from collections import deque, namedtuple
+
+
+Step = namedtuple('Step', ['index', 'ip', 'code', 'operands', 'write', 'output'])
+Step.__doc__ = """
+An executed instruction: its address, code and operand cells, the
+memory write as (address, old, new) or None, and the output value.
+The input of an input instruction is the new value of its write.
+"""
+
+
+class Trace:
+    """
+    Bounded ring buffer of the last steps executed by a DecodedEngine
+    created with this trace.
+    """
+    def __init__(self, size=100000):
+        self.steps = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, ip, code, operands, write, output):
+        self.steps.append(Step(self.count, ip, code, tuple(operands), write, output))
+        self.count += 1
+
+    def replay(self, program):
+        """
+        Returns a Replay positioned after the last recorded step, which
+        must be the last step executed by the program.
+        """
+        return Replay(self, program)
+
+
+class Replay:
+    """
+    Reconstructs the state of a program before any recorded step by
+    undoing or redoing the memory writes of the trace.
+    """
+    def __init__(self, trace, program):
+        self._steps = list(trace.steps)
+        self._first = self._steps[0].index if self._steps else trace.count
+        self.memory = program._program.copy()
+        self.ip = self._end_ip = program._instruction_pointer
+        self.position = trace.count
+
+    def seek(self, index):
+        """
+        Move to the state before step index was executed, or after the
+        last step for the step count of the trace.
+        """
+        end = self._first + len(self._steps)
+        if not self._first <= index <= end:
+            raise IndexError("Step {} is not in the trace".format(index))
+
+        while self.position > index:
+            self.position -= 1
+            step = self._steps[self.position - self._first]
+            if step.write is not None:
+                address, old, _ = step.write
+                self.memory[address] = old
+            self.ip = step.ip
+
+        while self.position < index:
+            step = self._steps[self.position - self._first]
+            if step.write is not None:
+                address, _, new = step.write
+                self.memory[address] = new
+            self.position += 1
+            self.ip = (self._steps[self.position - self._first].ip
+                       if self.position < end else self._end_ip)
+        return self
+
+    def step(self, index):
+        """
+        Returns the recorded Step with the given index.
+        """
+        return self._steps[index - self._first]
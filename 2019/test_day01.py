@@ -1,5 +1,7 @@
+import io
 import unittest
-from day01 import fuel_for_mass, sum_func, corrected_fuel_for_mass
+import day01
+from day01 import fuel_for_mass, sum_func, corrected_fuel_for_mass, sum_fuel
 
 
 class TestDay01(unittest.TestCase):
@@ -31,3 +33,18 @@ class TestDay01(unittest.TestCase):
         self.assertEqual(corrected_fuel_for_mass(216), 70 + 21 + 5)
         self.assertEqual(corrected_fuel_for_mass(1969), 966)
         self.assertEqual(corrected_fuel_for_mass(100756), 50346)
+
+    def test_sum_fuel(self):
+        module_masses = ['12', '14', '1969', '100756']
+        for corrected, expected in [(False, 2 + 2 + 654 + 33583), (True, 2 + 2 + 966 + 50346)]:
+            self.assertEqual(sum_fuel(module_masses, corrected), expected)
+            self.assertEqual(sum_fuel(module_masses, corrected, chunk_size=3), expected)
+            for chunk_size in [1, 2, 100]:
+                stream = io.StringIO("12\n14\n1969\n100756")
+                self.assertEqual(sum_fuel(stream, corrected, chunk_size), expected)
+            self.assertEqual(sum_fuel(io.BytesIO(b"12\n14\n1969\n100756\n"), corrected, 1), expected)
+
+    @unittest.skipIf(day01.np is None, "NumPy is not installed")
+    def test_corrected_fuel_for_masses(self):
+        masses = day01.np.array([5, 21, 70, 216, 1969, 100756])
+        self.assertEqual(day01.corrected_fuel_for_masses(masses), 0 + 5 + 26 + 96 + 966 + 50346)
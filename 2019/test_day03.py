@@ -1,5 +1,9 @@
+import io
+import mmap
+import tempfile
+import tracemalloc
 import unittest
-from day03 import Wire, Panel
+from day03 import Wire, Panel, PairCrossings, parse_moves, read_wires
 
 
 class TestDay03(unittest.TestCase):
@@ -35,3 +39,99 @@ class TestDay03(unittest.TestCase):
         wire_2 = Wire("U98,R91,D20,R16,D67,R40,U7,R15,U6,R7")
         panel = Panel(wire_1, wire_2)
         self.assertEqual(panel.minimum_steps_to_crossing(), 410)
+
+    def test_collinear_crossings(self):
+        # The wires share the points from (2, 0) to (5, 0).
+        panel = Panel(Wire("R5,U2"), Wire("U1,R2,D1,R6"))
+        self.assertEqual(panel.distance(), 2)
+        self.assertEqual(panel.minimum_steps_to_crossing(), 2 + 4)
+
+        # A wire returning to the central port crosses the other there.
+        panel = Panel(Wire("R2,U2,L2,D2"), Wire("L1,R3"))
+        self.assertEqual(panel.distance(), 0)
+        self.assertEqual(panel.minimum_steps_to_crossing(), 1 + 3)
+
+    def test_long_segments(self):
+        wire_1 = Wire("R3000000,U2000000,L1000000,D4000000")
+        wire_2 = Wire("U1000000,R5000000")
+        panel = Panel(wire_1, wire_2)
+        self.assertEqual(panel.distance(), 3000000)
+        self.assertEqual(panel.minimum_steps_to_crossing(), 4000000 + 3000000 + 1000000)
+        self.assertEqual(wire_1.steps_to((2000000, -1)), 8000001)
+
+    def test_wire_points(self):
+        wire = Wire("R2,U1,L1,D1")
+        self.assertEqual(list(wire), [(1, 0), (2, 0), (2, 1), (1, 1), (1, 0)])
+        self.assertEqual(wire.steps_to((1, 0)), 1)
+        self.assertEqual(wire.steps_to((1, 1)), 4)
+        with self.assertRaises(ValueError):
+            wire.steps_to((0, 0))
+
+    def test_wire_steps_index(self):
+        # (2, 1) is visited on a vertical and later on a horizontal line.
+        wire = Wire("R2,U3,L1,D2,R3,U1,L5")
+        self.assertEqual(wire.steps_to((2, 1)), 3)
+        self.assertEqual(wire.steps_to((3, 1)), 10)
+        self.assertEqual(wire.steps_to((-1, 2)), 17)
+        self.assertEqual([wire.steps_to(point) for point in wire][:4], [1, 2, 3, 4])
+
+    def test_wire_memory(self):
+        tracemalloc.start()
+        try:
+            wire = Wire("R5000000,U5000000,L5000000,D5000000")
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(size, 10000)
+        self.assertEqual(wire.steps_to((0, 1)), 19999999)
+
+    def test_panel_of_many_wires(self):
+        wires = [
+            Wire("R8,U5,L5,D3"),
+            Wire("U7,R6,D4,L4"),
+            Wire("R75,D30,R83,U83,L12,D49,R71,U7,L72"),
+            Wire("U62,R66,U55,R34,D71,R55,D58,R83"),
+            Wire("L5,D5"),
+        ]
+        panel = Panel(*wires)
+        self.assertEqual(panel.pairs([3, 2]), [(2, 3)])
+        self.assertEqual(panel.distance([0, 1]), 6)
+        self.assertEqual(panel.minimum_steps_to_crossing([0, 1]), 30)
+        self.assertEqual(panel.distance([2, 3]), 159)
+        self.assertEqual(panel.minimum_steps_to_crossing([2, 3]), 610)
+        self.assertEqual(panel.distance(), 1)
+
+        crossings = panel.pair_crossings()
+        self.assertEqual(len(crossings), 10)
+        self.assertEqual(crossings[(0, 1)], PairCrossings(6, 30, 2))
+        self.assertEqual(crossings[(0, 4)], PairCrossings(None, None, 0))
+        self.assertEqual(panel.crossing_counts([0, 1, 4]), {(0, 1): 2, (0, 4): 0, (1, 4): 0})
+
+        self.assertEqual(Panel(*wires, processes=2).pair_crossings(chunksize=2), crossings)
+        with self.assertRaises(ValueError):
+            panel.distance([0, 4])
+
+    def test_parse_moves(self):
+        moves = list(parse_moves("R8,U5\nL12\n", block_size=3))
+        self.assertEqual(moves, [((1, 0), 8), ((0, 1), 5), (None, 0), ((-1, 0), 12), (None, 0)])
+        self.assertEqual(list(parse_moves(io.BytesIO(b"D10,L1"), block_size=2)),
+                         [((0, -1), 10), ((-1, 0), 1), (None, 0)])
+        with self.assertRaises(ValueError):
+            list(parse_moves("R8,X5"))
+
+    def test_read_wires(self):
+        paths = b"R75,D30,R83,U83,L12,D49,R71,U7,L72\nU62,R66,U55,R34,D71,R55,D58,R83\n"
+        for source in (paths, paths.decode(), io.StringIO(paths.decode()), io.BytesIO(paths)):
+            for block_size in (1, 5, 1 << 16):
+                panel = Panel(*read_wires(source, block_size))
+                self.assertEqual(panel.distance(), 159)
+                if hasattr(source, 'seek'):
+                    source.seek(0)
+
+        with tempfile.TemporaryFile() as file:
+            file.write(paths + b"\n")
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                wires = list(read_wires(buffer, block_size=7))
+        self.assertEqual(len(wires), 2)
+        self.assertEqual(Panel(*wires).minimum_steps_to_crossing(), 610)
@@ -1,5 +1,7 @@
 import unittest
-from day04 import two_adjacent_digits_same, never_decrease, two_adjacent_digits_same_2, repeated_digit_counts
+import day04
+from day04 import two_adjacent_digits_same, never_decrease, two_adjacent_digits_same_2, repeated_digit_counts, \
+    count_passwords, passwords
 
 
 class TestDay04(unittest.TestCase):
@@ -25,3 +27,34 @@ class TestDay04(unittest.TestCase):
         self.assertEqual(repeated_digit_counts([1, 2]), [1, 1])
         self.assertEqual(repeated_digit_counts([1, 2, 3]), [1, 1, 1])
         self.assertEqual(repeated_digit_counts([1, 2, 3, 3]), [1, 1, 2])
+
+    def test_count_passwords(self):
+        for start, end in ((1, 5000), (111110, 123456), (246540, 787419)):
+            self.assertEqual(count_passwords(start, end), sum(
+                1 for p in range(start, end + 1) if two_adjacent_digits_same(p) and never_decrease(p)))
+            self.assertEqual(count_passwords(start, end, exact=True), sum(
+                1 for p in range(start, end + 1) if two_adjacent_digits_same_2(p) and never_decrease(p)))
+        self.assertEqual(count_passwords(10, 5), 0)
+
+    def test_count_long_passwords(self):
+        # Non-decreasing sequences of 15 digits from 1 to 9, less those
+        # with 15 different digits, of which there are none.
+        self.assertEqual(count_passwords(10 ** 14, 10 ** 15 - 1), 490314)
+        self.assertEqual(count_passwords(111111111111111, 111111111111111, exact=True), 0)
+        self.assertEqual(count_passwords(111111111111122, 111111111111122, exact=True), 1)
+
+    @unittest.skipIf(day04.np is None, "NumPy is not installed")
+    def test_digit_rows(self):
+        digits = day04.digit_array(day04.np.array([0, 7, 1123, 111122, 123444]), 6)
+        self.assertEqual(digits[2].tolist(), [-6, -5, 1, 1, 2, 3])
+        self.assertEqual(day04.never_decrease_rows(digits).tolist(), [True, True, True, True, True])
+        self.assertEqual(day04.two_adjacent_digits_same_rows(digits).tolist(),
+                         [False, False, True, True, True])
+        self.assertEqual(day04.two_adjacent_digits_same_rows(digits, exact=True).tolist(),
+                         [False, False, True, True, False])
+
+    def test_passwords(self):
+        for exact in (False, True):
+            found = [int(p) for chunk in passwords(246540, 300000, exact, chunk_size=1000) for p in chunk]
+            self.assertEqual(len(found), count_passwords(246540, 300000, exact))
+            self.assertTrue(all(never_decrease(p) for p in found))